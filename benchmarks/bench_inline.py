@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark parser._inline() against the regex cascade it replaced.
+
+The cascade ran seven re.sub passes (code spans, images, class links, links,
+bold, italic) and restored code spans with one str.replace per span. It is
+kept here verbatim as the baseline; every input is checked to produce the
+same HTML before it is timed.
+
+Usage:
+    python3 benchmarks/bench_inline.py [--repeat N]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phosphor.parser import _escape, _escape_url, _inline  # noqa: E402
+
+
+def legacy_inline(text):
+    """The pre-tokenizer _inline(): one re.sub pass per construct."""
+    code_spans = []
+
+    def _save_code(m):
+        idx = len(code_spans)
+        code_spans.append(f"<code>{_escape(m.group(1).strip())}</code>")
+        return f"\x00CODE{idx}\x00"
+
+    text = re.sub(r"``(.+?)``", _save_code, text)
+    text = re.sub(r"`([^`]+)`", _save_code, text)
+
+    def _img_replace(m):
+        alt, src = _escape(m.group(1)), _escape_url(m.group(2))
+        return f'<img src="{src}" alt="{alt}">'
+    text = re.sub(r"!\[([^\]]*)\]\(([^)]+)\)", _img_replace, text)
+
+    def _link_class(m):
+        label, url, cls = m.group(1), _escape_url(m.group(2)), m.group(3)
+        return f'<a href="{url}" class="hero-btn {cls}">{label}</a>'
+    text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)\{\.(\w+)\}', _link_class, text)
+
+    def _link_replace(m):
+        label, url = m.group(1), _escape_url(m.group(2))
+        return f'<a href="{url}">{label}</a>'
+    text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", _link_replace, text)
+
+    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+    text = re.sub(r"\*(.+?)\*", r"<em>\1</em>", text)
+
+    for i, code_html in enumerate(code_spans):
+        text = text.replace(f"\x00CODE{i}\x00", code_html)
+
+    return text
+
+
+# Representative paragraph from a generated API reference page
+_API_SENTENCE = (
+    "Calls `Client.fetch(id, *, timeout=None)` and returns a **`Response`**; "
+    "see [retries](reference.html#retries) and *note* that `timeout` is in seconds. "
+)
+_PROSE_SENTENCE = "Phosphor turns a folder of Markdown files into a static documentation site. "
+
+CASES = [
+    ("prose sentence", _PROSE_SENTENCE),
+    ("api sentence", _API_SENTENCE),
+    ("prose x 500", _PROSE_SENTENCE * 500),
+    ("api x 500", _API_SENTENCE * 500),
+    ("code spans x 5000", "`arg` " * 5000),
+    ("links x 2000", "[item](page.html#item) " * 2000),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5, help="Timing repeats per case (default: 5)")
+    args = ap.parse_args()
+
+    print(f"{'case':<20} {'chars':>8} {'cascade':>12} {'tokenizer':>12} {'speedup':>8}")
+    for name, text in CASES:
+        if legacy_inline(text) != _inline(text):
+            print(f"{name}: output differs from the cascade", file=sys.stderr)
+            sys.exit(1)
+        number = max(1, 200000 // len(text))
+        old = min(timeit.repeat(lambda: legacy_inline(text), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: _inline(text), number=number, repeat=args.repeat)) / number
+        print(f"{name:<20} {len(text):>8} {old * 1e6:>10.1f}us {new * 1e6:>10.1f}us {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
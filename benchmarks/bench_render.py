@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark compiled-template rendering against per-page str.replace.
+
+The old render_page() rebuilt the theme CSS, favicon and GitHub link for
+every page and ran nine str.replace() calls over the whole page, the last
+one after the content was already in. It is kept here verbatim as the
+baseline; every page is checked to render the same HTML before it is timed.
+
+Usage:
+    python3 benchmarks/bench_render.py [--repeat N]
+"""
+
+import argparse
+import io
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phosphor import config as config_mod  # noqa: E402
+from phosphor import parser as parser_mod  # noqa: E402
+from phosphor import renderer as renderer_mod  # noqa: E402
+from phosphor.renderer import _escape, build_theme_css  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_render_page(template, config, page_content, nav_html, page_filename):
+    """The pre-compilation render_page(): nine replaces per page."""
+    site = config["site"]
+    page_title = site["title"]
+    custom_favicon = site.get("favicon", "")
+    if custom_favicon:
+        favicon = "assets/favicon.svg"
+    else:
+        theme = config.get("theme", {})
+        accent = theme.get("accent", "#22d3a7").replace("#", "")
+        favicon = f"assets/favicon.svg?v={accent}"
+    github_url = site.get("github", "")
+    github_html = ""
+    if github_url:
+        github_html = (
+            f'<a href="{_escape(github_url)}" '
+            f'style="display:flex;align-items:center;gap:8px;padding:12px 16px;'
+            f'color:var(--text-dim);font-size:12px;text-decoration:none;'
+            f'border-top:1px solid var(--border);margin-top:auto;">'
+            f'<i data-lucide="github" style="width:14px;height:14px;"></i>'
+            f'GitHub'
+            f'</a>'
+        )
+    theme_css = build_theme_css(config.get("theme", {}))
+    output = template
+    output = output.replace("{{THEME_CSS}}", theme_css)
+    output = output.replace("{{TITLE}}", _escape(page_title))
+    output = output.replace("{{SITE_TITLE}}", _escape(site["title"]))
+    output = output.replace("{{TAGLINE}}", _escape(site.get("tagline", "")))
+    output = output.replace("{{LOGO_TEXT}}", _escape(site.get("logo_text", "PD")))
+    output = output.replace("{{FAVICON}}", favicon)
+    output = output.replace("{{NAV}}", nav_html)
+    output = output.replace("{{GITHUB_LINK}}", github_html)
+    output = output.replace("{{CONTENT}}", page_content)
+    return output
+
+
+def peak_bytes(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5, help="Timing repeats (default: 5)")
+    args = ap.parse_args()
+
+    cfg = config_mod.load_config(os.path.join(ROOT, "docs.yaml"))
+    with open(os.path.join(ROOT, "templates", "base.html")) as f:
+        template = f.read()
+    # The old renderer predates the {{ICONS}} and {{TOC}} slots, which are
+    # empty without an icon set and headings
+    legacy_template = template.replace("{{ICONS}}", "").replace("{{TOC}}", "")
+    nav_html = renderer_mod.build_nav_html(cfg["nav"], "")
+    pages = []
+    for page_file in cfg["pages"]:
+        with open(os.path.join(ROOT, "pages", page_file)) as f:
+            pages.append((page_file.replace(".md", ".html"), parser_mod.parse_document(f.read()).to_html()))
+
+    compiled = renderer_mod.compile_template(template, cfg, nav_html)
+    for filename, html in pages:
+        if legacy_render_page(legacy_template, cfg, html, nav_html, filename) != renderer_mod.render_compiled(compiled, html):
+            print(f"{filename}: output differs from the str.replace renderer", file=sys.stderr)
+            sys.exit(1)
+
+    def legacy_all():
+        for filename, html in pages:
+            io.StringIO().write(legacy_render_page(legacy_template, cfg, html, nav_html, filename))
+
+    def compiled_all():
+        compiled = renderer_mod.compile_template(template, cfg, nav_html)
+        for filename, html in pages:
+            renderer_mod.write_page(io.StringIO(), compiled, html)
+
+    number = 200
+    old = min(timeit.repeat(legacy_all, number=number, repeat=args.repeat)) / number / len(pages)
+    new = min(timeit.repeat(compiled_all, number=number, repeat=args.repeat)) / number / len(pages)
+    print(f"{len(pages)} pages, {sum(len(h) for _, h in pages)} chars of content")
+    print(f"{'':<12} {'per page':>10} {'peak alloc':>12}")
+    print(f"{'replace':<12} {old * 1e6:>8.1f}us {peak_bytes(legacy_all) / 1024:>10.0f}KB")
+    print(f"{'compiled':<12} {new * 1e6:>8.1f}us {peak_bytes(compiled_all) / 1024:>10.0f}KB")
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
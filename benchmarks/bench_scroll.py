@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Browser benchmark for the scroll spy in theme/script.js.
+
+Generates a synthetic project with one long page (about 400 headings at the
+defaults, every section linked from the nav), builds it, and writes two
+copies of the page next to it: scroll-current.html runs theme/script.js,
+and scroll-legacy.html runs the scroll spy it replaced, which read
+offsetTop of every section and TOC target on each scroll event, after
+changing the nav classes. That one is kept here verbatim as the baseline.
+
+Open both pages in a browser window at least 1200px wide (so the TOC is
+shown). Each page scrolls itself to the bottom and back, one step per
+frame, and shows the frame times; they are also logged to the console and
+left in window.scrollBenchResult. Add ?step=N to the URL to scroll N pixels
+a frame (default: 40).
+
+Usage:
+    python3 benchmarks/bench_scroll.py [--page-size KB] [--output DIR]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phosphor import bench as bench_mod  # noqa: E402
+from phosphor import build as build_mod  # noqa: E402
+from phosphor import parser as parser_mod  # noqa: E402
+
+PAGE = "page-0000.html"
+
+# Written into --output, so a later run knows the directory is its own to replace
+MARKER = ".phosphor-scroll-bench"
+
+LEGACY_SCROLL_SPY = """
+var toc = document.querySelector('.toc');
+
+// ── Scroll spy — highlight active sidebar link + TOC link ──
+var sections = document.querySelectorAll('.section[id]');
+var h3Elements = document.querySelectorAll('.content h3[id]');
+var navLinks = document.querySelectorAll('.sidebar-nav a');
+var tocAnchors = toc ? toc.querySelectorAll('a') : [];
+var backToTop = document.querySelector('.back-to-top');
+
+function onScroll() {
+  var scrollY = window.scrollY + 120;
+
+  // Back to top visibility
+  if (window.scrollY > 400) {
+    backToTop.classList.add('visible');
+  } else {
+    backToTop.classList.remove('visible');
+  }
+
+  // Sidebar scroll spy
+  var current = '';
+  sections.forEach(function(section) {
+    if (section.offsetTop <= scrollY) {
+      current = section.id;
+    }
+  });
+
+  navLinks.forEach(function(link) {
+    link.classList.remove('active');
+    var href = link.getAttribute('href');
+    if (href === '#' + current || href.endsWith('#' + current)) {
+      link.classList.add('active');
+    }
+  });
+
+  // TOC scroll spy
+  if (tocAnchors.length > 0) {
+    var currentToc = '';
+    tocAnchors.forEach(function(a) {
+      var id = a.getAttribute('href').slice(1);
+      var el = document.getElementById(id);
+      if (el && el.offsetTop <= scrollY) {
+        currentToc = id;
+      }
+    });
+    tocAnchors.forEach(function(a) {
+      a.classList.remove('active');
+      if (a.getAttribute('href') === '#' + currentToc) {
+        a.classList.add('active');
+      }
+    });
+  }
+}
+
+window.addEventListener('scroll', onScroll, { passive: true });
+onScroll();
+"""
+
+# Scrolls the page down and back up one step a frame and reports the time
+# between frames
+HARNESS = """
+(function() {
+  var step = Number(new URLSearchParams(location.search).get('step')) || 40;
+
+  function run() {
+    var max = document.documentElement.scrollHeight - window.innerHeight;
+    var frames = [];
+    var last = null;
+    var y = 0;
+    var dir = 1;
+    window.scrollTo(0, 0);
+    requestAnimationFrame(function frame(now) {
+      if (last !== null) frames.push(now - last);
+      last = now;
+      y += dir * step;
+      if (y >= max) {
+        y = max;
+        dir = -1;
+      } else if (y <= 0 && dir < 0) {
+        return report(frames);
+      }
+      window.scrollTo(0, y);
+      requestAnimationFrame(frame);
+    });
+  }
+
+  function report(frames) {
+    var sorted = frames.slice().sort(function(a, b) { return a - b; });
+    var total = frames.reduce(function(a, b) { return a + b; }, 0);
+    var result = {
+      page: document.title.indexOf('legacy') !== -1 ? 'legacy' : 'current',
+      step: step,
+      frames: frames.length,
+      mean: total / frames.length,
+      median: sorted[Math.floor(sorted.length / 2)],
+      p95: sorted[Math.floor(sorted.length * 0.95)],
+      max: sorted[sorted.length - 1],
+      over_budget: frames.filter(function(t) { return t > 1000 / 60 + 1; }).length
+    };
+    window.scrollBenchResult = result;
+    console.log(JSON.stringify(result));
+    var box = document.createElement('pre');
+    box.style.cssText = 'position:fixed;right:16px;bottom:16px;z-index:9999;margin:0;padding:12px 16px;' +
+      'background:#000;color:#22d3a7;font:12px monospace;border:1px solid #22d3a7;';
+    box.textContent = result.page + ' scroll spy, ' + result.frames + ' frames of ' + step + 'px\\n' +
+      ['mean', 'median', 'p95', 'max'].map(function(k) {
+        return k + ': ' + result[k].toFixed(1) + ' ms';
+      }).join('\\n') + '\\nover 16.7 ms: ' + result.over_budget;
+    document.body.appendChild(box);
+  }
+
+  window.addEventListener('load', function() { setTimeout(run, 500); });
+})();
+"""
+
+
+def write_project(directory, page_size):
+    """Write a one-page project whose nav links to every section of the
+    page; returns the number of headings on it."""
+    bench_mod.generate_project(directory, pages=1, page_size=page_size, heading_density=0.5)
+    with open(os.path.join(directory, "pages", "page-0000.md")) as f:
+        headings = parser_mod.parse_document(f.read()).headings()
+    cfg = {
+        "site": {"title": "Scroll benchmark", "tagline": "~/bench", "logo_text": "SB"},
+        "nav": [{"group": "Sections",
+                 "items": [{"label": h["text"], "icon": "hash", "page": "page-0000.md", "anchor": h["id"]}
+                           for h in headings if h["level"] == 2]}],
+        "pages": ["page-0000.md"],
+    }
+    with open(os.path.join(directory, "docs.yaml"), "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    return len(headings)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--page-size", type=int, default=200, help="Size of the page in KB of Markdown (default: 200)")
+    ap.add_argument("--output", default=os.path.join(tempfile.gettempdir(), "phosphor-scroll-bench"),
+                    help="Empty directory to write the project and pages to; one left by an earlier run is replaced "
+                         "(default: phosphor-scroll-bench in the temp dir)")
+    args = ap.parse_args()
+
+    project_dir = os.path.abspath(args.output)
+    if os.path.isdir(project_dir) and os.listdir(project_dir):
+        if not os.path.isfile(os.path.join(project_dir, MARKER)):
+            print(f"Error: {args.output} is not empty", file=sys.stderr)
+            sys.exit(1)
+        shutil.rmtree(project_dir)
+    count = write_project(project_dir, args.page_size)
+    open(os.path.join(project_dir, MARKER), "w").close()
+    site_dir = os.path.join(project_dir, "_site")
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_mod.build(project_dir, output_dir=site_dir, full=True)
+
+    with open(os.path.join(site_dir, PAGE)) as f:
+        page = f.read()
+    script_re = re.compile(r'<script src="assets/script\.[0-9a-f]+\.js"></script>')
+    if not script_re.search(page):
+        print(f"{PAGE}: script.js not found in the page", file=sys.stderr)
+        sys.exit(1)
+    harness = f"<script>{HARNESS}</script>\n</body>"
+    variants = {
+        "current": page,
+        "legacy": script_re.sub(lambda m: f"<script>{LEGACY_SCROLL_SPY}</script>", page),
+    }
+    print(f"{PAGE}: {count} headings, {os.path.getsize(os.path.join(site_dir, PAGE)) / 1024:.0f}KB of HTML")
+    for name, html in variants.items():
+        html = html.replace("<title>", f"<title>[{name}] ", 1).replace("</body>", harness, 1)
+        path = os.path.join(site_dir, f"scroll-{name}.html")
+        with open(path, "w") as f:
+            f.write(html)
+        print(f"  {name:<8} file://{path}")
+
+
+if __name__ == "__main__":
+    main()
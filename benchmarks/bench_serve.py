@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Load-test the phosphor serve preview server against the one it replaced.
+
+Builds the Phosphor docs into a temporary directory, then serves it twice on
+local ports: with the old setup (single-threaded http.server.HTTPServer and
+SimpleHTTPRequestHandler: HTTP/1.0, a connection per request, no gzip) and
+with server.PreviewServer. Each run has N client threads request the built
+pages and assets in a loop for a fixed time, each over one http.client
+connection sending Accept-Encoding: gzip and replaying ETags (unless
+--cold). The script reports requests per second, body bytes received and
+failed requests.
+
+--slow-client adds a client that opens a connection, sends half a request
+line and then stalls, like a browser on a bad network. The single-threaded
+server is stuck on it and every other client times out.
+
+Usage:
+    python3 benchmarks/bench_serve.py [--clients N] [--seconds S] [--cold] [--slow-client]
+"""
+
+import argparse
+import contextlib
+import http.client
+import http.server
+import io
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phosphor import build as build_mod  # noqa: E402
+from phosphor import server as server_mod  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _QuietLegacyHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, fmt, *a):
+        pass
+
+
+class _LegacyServer(http.server.HTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # clients that gave up waiting
+
+
+class _QuietPreviewHandler(server_mod.PreviewHandler):
+    def log_message(self, fmt, *a):
+        pass
+
+
+def build_site(tmp):
+    """Build the repo's docs into tmp/_site and return the URL paths to fetch."""
+    project = os.path.join(tmp, "project")
+    os.makedirs(project)
+    shutil.copy2(os.path.join(ROOT, "docs.yaml"), project)
+    shutil.copytree(os.path.join(ROOT, "pages"), os.path.join(project, "pages"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_mod.build(project)
+    site = os.path.join(project, "_site")
+    urls = []
+    for root, _, files in os.walk(site):
+        for fname in sorted(files):
+            rel = os.path.relpath(os.path.join(root, fname), site)
+            urls.append("/" + rel.replace(os.sep, "/"))
+    return site, urls
+
+
+def start_legacy(site):
+    def handler(*a):
+        return _QuietLegacyHandler(*a, directory=site)
+    return _LegacyServer(("127.0.0.1", 0), handler)
+
+
+def start_preview(site):
+    return server_mod.PreviewServer(("127.0.0.1", 0), site, handler=_QuietPreviewHandler)
+
+
+def client(port, urls, deadline, revalidate, stats, lock):
+    """Request *urls* round-robin until *deadline*, replaying ETags if *revalidate*."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    etags = {}
+    done = failed = wire = 0
+    i = 0
+    while time.perf_counter() < deadline:
+        url = urls[i % len(urls)]
+        i += 1
+        headers = {"Accept-Encoding": "gzip"}
+        if url in etags:
+            headers["If-None-Match"] = etags[url]
+        try:
+            conn.request("GET", url, headers=headers)
+            res = conn.getresponse()
+            body = res.read()
+            if res.status not in (200, 304):
+                failed += 1
+                continue
+            if revalidate and res.getheader("ETag"):
+                etags[url] = res.getheader("ETag")
+            wire += len(body)
+            done += 1
+            if res.getheader("Connection", "").lower() == "close" or res.version == 10:
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+    conn.close()
+    with lock:
+        stats["done"] += done
+        stats["failed"] += failed
+        stats["wire"] += wire
+
+
+def run(server, urls, clients, seconds, revalidate, slow_client):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+
+    staller = None
+    if slow_client:
+        staller = socket.create_connection(("127.0.0.1", port))
+        staller.sendall(b"GET /index.ht")
+        time.sleep(0.1)
+
+    stats = {"done": 0, "failed": 0, "wire": 0}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + seconds
+    workers = [threading.Thread(target=client, args=(port, urls, deadline, revalidate, stats, lock)) for _ in range(clients)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    if staller is not None:
+        staller.close()
+    server.shutdown()
+    server.server_close()
+    return stats["done"] / elapsed, stats["wire"], stats["failed"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--clients", type=int, default=8, help="Concurrent clients (default: 8)")
+    ap.add_argument("--seconds", type=float, default=3.0, help="Duration of each run (default: 3)")
+    ap.add_argument("--cold", action="store_true", help="Don't replay ETags: every request fetches the full body")
+    ap.add_argument("--slow-client", action="store_true", help="Add one client that stalls mid-request")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site, urls = build_site(tmp)
+        print(f"{len(urls)} files, {args.clients} clients, {args.seconds:g}s per server"
+              + (", one stalled client" if args.slow_client else ""))
+        print(f"{'server':<10} {'req/s':>10} {'MB sent':>10} {'failed':>8}")
+        results = {}
+        for name, start in (("legacy", start_legacy), ("preview", start_preview)):
+            rate, wire, failed = run(start(site), urls, args.clients, args.seconds, not args.cold, args.slow_client)
+            results[name] = rate
+            print(f"{name:<10} {rate:>10.0f} {wire / 1e6:>10.2f} {failed:>8}")
+        if results["legacy"]:
+            print(f"\npreview / legacy: {results['preview'] / results['legacy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark CLI startup and docs.yaml loading.
+
+Times a fresh interpreter running `python -m phosphor --help` and importing
+phosphor.build (what `phosphor build` loads before it does any work), each
+against a bare `python -c pass`, and loading a large generated docs.yaml with
+PyYAML's pure-Python SafeLoader and with libyaml's CSafeLoader, which
+config.load_config() uses when it is available. Both loaders are checked to
+produce the same config before they are timed.
+
+Startup times include compiling any module whose bytecode isn't cached, so
+run `python3 -m compileall -q phosphor` first.
+
+Usage:
+    python3 benchmarks/bench_startup.py [--repeat N] [--nav-items N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phosphor import config as config_mod  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = (
+    ("python -c pass", ["-c", "pass"]),
+    ("phosphor --help", ["-m", "phosphor", "--help"]),
+    ("import build", ["-c", "import phosphor.build"]),
+)
+
+
+def startup(argv, repeat):
+    """Best wall time of *repeat* fresh interpreters running *argv*."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        runs.append(time.perf_counter() - start)
+    return min(runs)
+
+
+def write_config(path, nav_items):
+    """Write a docs.yaml with *nav_items* pages in groups of 20."""
+    pages = [f"page-{n:05d}.md" for n in range(nav_items)]
+    cfg = {
+        "site": {"title": "Startup benchmark", "tagline": "~/bench", "logo_text": "SB", "github": "https://github.com/example/docs"},
+        "theme": {"accent": "#22d3a7", "bg": "#0b0d10"},
+        "nav": [
+            {"group": f"Group {g + 1}",
+             "items": [{"label": f"Page {p[5:10]}", "icon": "book-open", "page": p} for p in pages[i:i + 20]]}
+            for g, i in enumerate(range(0, len(pages), 20))
+        ],
+        "pages": pages,
+    }
+    with open(path, "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+
+
+def load(path, loader):
+    with open(path) as f:
+        return yaml.load(f, Loader=loader)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=10, help="Timing repeats (default: 10)")
+    ap.add_argument("--nav-items", type=int, default=4000, help="Pages in the generated docs.yaml (default: 4000)")
+    args = ap.parse_args()
+
+    print(f"{'':<18} {'startup':>10}")
+    base = None
+    for label, argv in COMMANDS:
+        t = startup(argv, args.repeat)
+        extra = "" if base is None else f"  (+{(t - base) * 1000:.1f}ms over python)"
+        base = t if base is None else base
+        print(f"{label:<18} {t * 1000:>8.1f}ms{extra}")
+
+    if not hasattr(yaml, "CSafeLoader"):
+        print("\nlibyaml is not available: config loads with the pure-Python SafeLoader")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "docs.yaml")
+        write_config(path, args.nav_items)
+        for config_path in (path, os.path.join(ROOT, "docs.yaml")):
+            if load(config_path, yaml.SafeLoader) != load(config_path, yaml.CSafeLoader):
+                print(f"{config_path}: CSafeLoader and SafeLoader disagree", file=sys.stderr)
+                sys.exit(1)
+
+        number = 3
+        times = {
+            label: min(timeit.repeat(lambda: func(path), number=number, repeat=args.repeat)) / number
+            for label, func in (
+                ("SafeLoader", lambda p: load(p, yaml.SafeLoader)),
+                ("CSafeLoader", lambda p: load(p, yaml.CSafeLoader)),
+                ("load_config", config_mod.load_config),
+            )
+        }
+        print(f"\ndocs.yaml: {args.nav_items} nav items, {os.path.getsize(path) / 1024:.0f}KB")
+        for label, t in times.items():
+            print(f"{label:<18} {t * 1000:>8.1f}ms")
+        print(f"speedup: {times['SafeLoader'] / times['CSafeLoader']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""Phosphor — static documentation site generator."""
+
+__version__ = "0.2.1"
@@ -0,0 +1,303 @@
+"""Benchmarks for the build pipeline (phosphor bench).
+
+generate_project() writes a deterministic synthetic project: the same
+parameters and seed always produce byte-identical pages, so timings from two
+runs (or two commits) measure the code, not the corpus. run() then times
+each stage of the pipeline on it: parsing, search indexing, rendering
+(document tree and table of contents to HTML, through the compiled
+template), and a full and a no-change build().
+
+Results are plain dicts that serialize to JSON; compare() checks them
+against a stored baseline and reports every benchmark that got slower than
+the allowed threshold.
+"""
+
+import contextlib
+import gc
+import io
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import yaml
+
+from . import __version__
+from . import build as build_mod
+from . import cache as cache_mod
+from . import config as config_mod
+from . import parser as parser_mod
+from . import renderer as renderer_mod
+from . import search as search_mod
+
+
+# Content blocks a generated page is made of, with their default weights
+DEFAULT_MIX = {
+    "paragraph": 6,
+    "list": 2,
+    "code": 1,
+    "terminal": 1,
+    "table": 1,
+    "cards": 1,
+    "command": 1,
+    "callout": 1,
+}
+
+BENCHMARKS = ("parse", "search", "render", "build", "rebuild")
+
+_WORDS = (
+    "build page index render parse search config theme template section heading "
+    "cache output source module server request client stream token anchor card "
+    "command flag option value default project layout sidebar content block "
+    "table column row entry field term query result match score prefix fetch "
+    "asset style script icon color accent border surface deep bright dim hover "
+    "the a of to and in for with on by from is are be can will each every this "
+    "that when then only once more less fast slow large small new old first last"
+).split()
+
+_ICONS = ("code", "terminal", "zap", "book-open", "settings", "search", "layers", "box")
+_COLORS = ("teal", "amber", "blue", "purple", "red")
+
+
+def parse_mix(spec):
+    """Parse "cards=2,table=0" into a full mix dict; raise ValueError if invalid.
+
+    Kinds that aren't mentioned keep their default weight.
+    """
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, sep, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in mix or not sep:
+            raise ValueError(f"expected KIND=WEIGHT with KIND one of {', '.join(DEFAULT_MIX)}, got {item!r}")
+        try:
+            mix[kind] = int(weight)
+        except ValueError:
+            raise ValueError(f"weight for {kind} must be a whole number, got {weight!r}") from None
+        if mix[kind] < 0:
+            raise ValueError(f"weight for {kind} must not be negative")
+    if not any(mix.values()):
+        raise ValueError("at least one block kind needs a positive weight")
+    return mix
+
+
+def generate_project(directory, pages=100, page_size=8, heading_density=0.25, mix=None, seed=1):
+    """Write docs.yaml and pages/*.md for a synthetic project into *directory*.
+
+    Returns the total size of the generated Markdown in bytes.
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = [kind for kind, weight in mix.items() if weight > 0]
+    weights = [mix[kind] for kind in kinds]
+
+    pages_dir = os.path.join(directory, "pages")
+    os.makedirs(pages_dir, exist_ok=True)
+    page_files = [f"page-{n:04d}.md" for n in range(pages)]
+    total = 0
+    for page_file in page_files:
+        text = _page(rng, page_files, page_size * 1024, heading_density, kinds, weights)
+        with open(os.path.join(pages_dir, page_file), "w") as f:
+            f.write(text)
+        total += len(text.encode("utf-8"))
+
+    groups = [page_files[i:i + 20] for i in range(0, len(page_files), 20)]
+    cfg = {
+        "site": {"title": "Benchmark", "tagline": "~/bench", "logo_text": "BM"},
+        "nav": [
+            {"group": f"Group {g + 1}",
+             "items": [{"label": _title(rng), "icon": rng.choice(_ICONS), "page": p} for p in group]}
+            for g, group in enumerate(groups)
+        ],
+        "pages": page_files,
+    }
+    with open(os.path.join(directory, "docs.yaml"), "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    return total
+
+
+def _title(rng, words=3):
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize()
+
+
+def _sentence(rng, page_files):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 16))]
+    i = rng.randrange(len(words))
+    markup = rng.random()
+    if markup < 0.15:
+        words[i] = f"`{words[i]}`"
+    elif markup < 0.25:
+        words[i] = f"**{words[i]}**"
+    elif markup < 0.30:
+        words[i] = f"[{words[i]}]({rng.choice(page_files).replace('.md', '.html')})"
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng, page_files):
+    return " ".join(_sentence(rng, page_files) for _ in range(rng.randint(2, 5)))
+
+
+def _block(rng, kind, page_files):
+    if kind == "paragraph":
+        return _paragraph(rng, page_files)
+    if kind == "list":
+        marker = rng.choice(("- ", "1. "))
+        return "\n".join(marker + _sentence(rng, page_files) for _ in range(rng.randint(3, 6)))
+    if kind == "code":
+        lines = [f"{rng.choice(_WORDS)} = {rng.choice(_WORDS)}({rng.choice(_WORDS)}, {rng.randint(0, 99)})"
+                 for _ in range(rng.randint(3, 10))]
+        return "```python\n" + "\n".join(lines) + "\n```"
+    if kind == "terminal":
+        lines = []
+        for _ in range(rng.randint(1, 3)):
+            lines.append(f"$ phosphor {rng.choice(('build', 'serve', 'init'))} --{rng.choice(_WORDS)}")
+            lines += [f"  {_title(rng, 4)}" for _ in range(rng.randint(1, 3))]
+        lines.append(f"# {_title(rng, 3)}")
+        return "```terminal\n" + "\n".join(lines) + "\n```"
+    if kind == "table":
+        columns = rng.randint(3, 5)
+        rows = ["| " + " | ".join(_title(rng, 1) for _ in range(columns)) + " |",
+                "| " + " | ".join("---" for _ in range(columns)) + " |"]
+        for _ in range(rng.randint(3, 8)):
+            rows.append("| " + " | ".join(f"`{rng.choice(_WORDS)}`" if c == 0 else _title(rng, rng.randint(1, 4))
+                                          for c in range(columns)) + " |")
+        return "\n".join(rows)
+    if kind == "cards":
+        cards = [f'::card{{icon="{rng.choice(_ICONS)}" color="{rng.choice(_COLORS)}" title="{_title(rng, 2)}"}}\n'
+                 f"{_sentence(rng, page_files)}\n::"
+                 for _ in range(rng.randint(2, 4))]
+        return ":::cards\n" + "\n\n".join(cards) + "\n:::"
+    if kind == "command":
+        name = rng.choice(_WORDS)
+        flags = [f'::flag{{name="--{rng.choice(_WORDS)}" short="-{rng.choice("abcdefgh")}"}}\n'
+                 f"{_sentence(rng, page_files)}\n::"
+                 for _ in range(rng.randint(1, 4))]
+        return f':::command{{title="{name}" usage="{name} [options]"}}\n' + "\n".join(flags) + "\n:::"
+    if kind == "callout":
+        return f":::{rng.choice(('tip', 'info', 'warn'))} {_title(rng)}\n{_paragraph(rng, page_files)}\n:::"
+    raise ValueError(f"unknown block kind: {kind}")
+
+
+def _page(rng, page_files, size, heading_density, kinds, weights):
+    blocks = [f"## {_title(rng)}", _paragraph(rng, page_files)]
+    length = sum(len(b) for b in blocks)
+    while length < size:
+        if rng.random() < heading_density:
+            level = "###" if rng.random() < 0.35 else "##"
+            blocks.append(f"{level} {_title(rng)}")
+        blocks.append(_block(rng, rng.choices(kinds, weights)[0], page_files))
+        length += len(blocks[-1]) + 2
+    return "\n\n".join(blocks) + "\n"
+
+
+def _time(func, repeat):
+    """Run *func* *repeat* times; return the wall time of each run."""
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def run(project_dir, repeat=5, only=None):
+    """Time the pipeline benchmarks on the project in *project_dir*.
+
+    Returns {benchmark: {"min", "median", "runs"}} in seconds. *only*
+    limits it to some of BENCHMARKS.
+    """
+    only = only or BENCHMARKS
+    cfg = config_mod.load_config(os.path.join(project_dir, "docs.yaml"))
+    sources = []
+    for page_file in cfg["pages"]:
+        with open(os.path.join(project_dir, "pages", page_file)) as f:
+            sources.append((page_file.replace(".md", ".html"), f.read()))
+
+    # Inputs for the later stages are prepared outside the timed code
+    documents = [(filename, parser_mod.parse_document(source)) for filename, source in sources]
+    rendered = []
+    for filename, document in documents:
+        marks = []
+        rendered.append((filename, document.render(marks), marks))
+    phosphor_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(phosphor_root, "templates", "base.html")) as f:
+        template = f.read()
+
+    def parse():
+        for _, source in sources:
+            parser_mod.parse_markdown(source)
+
+    def search():
+        search_mod.build_search_index([search_mod.page_entries(filename, html, marks)
+                                       for filename, html, marks in rendered])
+
+    def render():
+        nav_html = renderer_mod.build_nav_html(cfg["nav"], "")
+        compiled = renderer_mod.compile_template(template, cfg, nav_html)
+        for _, document in documents:
+            toc = renderer_mod.build_toc_html(document.headings())
+            renderer_mod.write_page(io.StringIO(), compiled, document.to_html(), toc=toc)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = os.path.join(tmp, "_site")
+        parse_cache = cache_mod.ParseCache(os.path.join(tmp, "parsed"))
+
+        def build():
+            # From scratch: every page is parsed and saved to an empty cache
+            cold_cache = cache_mod.ParseCache(tempfile.mkdtemp(dir=tmp))
+            build_mod.build(project_dir, output_dir=output_dir, full=True, parse_cache=cold_cache)
+
+        def rebuild():
+            build_mod.build(project_dir, output_dir=output_dir, parse_cache=parse_cache)
+
+        stages = {"parse": parse, "search": search, "render": render, "build": build, "rebuild": rebuild}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in BENCHMARKS:
+                if name == "rebuild" and name in only:
+                    # Warm up: write the site and fill the cache it reads
+                    rebuild()
+                if name in only:
+                    runs = _time(stages[name], repeat)
+                    results[name] = {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+    return results
+
+
+def report(corpus, results, repeat):
+    """Return the JSON report for one run."""
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "corpus": corpus,
+        "repeat": repeat,
+        "results": {
+            name: {"min": round(r["min"], 6), "median": round(r["median"], 6), "runs": [round(t, 6) for t in r["runs"]]}
+            for name, r in results.items()
+        },
+    }
+
+
+def check_corpus(corpus, baseline):
+    """Raise ValueError if *baseline* was recorded on a different corpus."""
+    if corpus != baseline.get("corpus"):
+        raise ValueError("the baseline was recorded on a different corpus; rerun with the same parameters")
+
+
+def compare(current, baseline, threshold):
+    """Return the benchmarks in *current* slower than *baseline* by more than
+    *threshold* (a fraction), as [(name, baseline min, current min)].
+
+    Raises ValueError if the two were run on different corpora.
+    """
+    check_corpus(current["corpus"], baseline)
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is not None and result["min"] > base["min"] * (1 + threshold):
+            regressions.append((name, base["min"], result["min"]))
+    return regressions
@@ -1,16 +1,23 @@
 """Build orchestrator for phosphor-docs.
 
 Loads config, parses pages, renders templates, generates search index,
-writes output to _site/ directory.
+stages the output and publishes what changed to the _site/ directory.
 """
 
+import json
 import os
 import re
-import shutil
 import sys
+import time
+from collections import deque
 
+from . import cache as cache_mod
 from . import config as config_mod
+from . import icons as icons_mod
+from . import manifest as manifest_mod
+from . import output as output_mod
 from . import parser as parser_mod
+from . import profile as profile_mod
 from . import renderer as renderer_mod
 from . import search as search_mod
 
@@ -23,18 +30,218 @@ def _is_safe_path(path, allowed_dir):
 
 
 _COLOR_RE = re.compile(r"^(#[0-9a-fA-F]{3,8}|rgba?\([^)]+\))$")
+_HASHED_INDEX_RE = re.compile(r"^search-index\.[0-9a-f]+\.json$")
 
+# Files copied unchanged from theme/ to assets/
+_THEME_ASSETS = ("style.css", "script.js", "search.js")
 
-def build(project_dir, output_dir=None):
+# Written to assets/: maps each asset's name to its fingerprinted file
+ASSET_MANIFEST = "asset-manifest.json"
+
+
+def asset_manifest(assets):
+    """Return the JSON of the asset manifest for *assets*, {name: file name}."""
+    return json.dumps(dict(sorted(assets.items())), indent=2) + "\n"
+
+
+def favicon_svg(cfg):
+    """Return the generated favicon SVG: logo_text on an accent gradient."""
+    theme = cfg.get("theme", {})
+    accent = theme.get("accent", "#22d3a7")
+    accent_dim = theme.get("accent_dim", "#1a9e7e")
+    bg_deep = theme.get("bg_deep", "#080c14")
+    logo_text = cfg["site"].get("logo_text", "PD")
+
+    # Validate that color values look safe before injecting into SVG
+    for color_name, color_val in [("accent", accent), ("accent_dim", accent_dim), ("bg_deep", bg_deep)]:
+        if not _COLOR_RE.match(str(color_val)):
+            print(f"  Error: invalid theme color for {color_name}: {color_val!r}", file=sys.stderr)
+            sys.exit(1)
+
+    from . renderer import _escape
+    safe_logo = _escape(str(logo_text))
+
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 32 32">\n'
+        '  <defs>\n'
+        '    <linearGradient id="g" x1="0" y1="0" x2="1" y2="1">\n'
+        f'      <stop offset="0%" stop-color="{accent}"/>\n'
+        f'      <stop offset="100%" stop-color="{accent_dim}"/>\n'
+        '    </linearGradient>\n'
+        '  </defs>\n'
+        f'  <rect width="32" height="32" rx="6" fill="url(#g)"/>\n'
+        f'  <text x="16" y="22" text-anchor="middle" '
+        f'font-family="system-ui,sans-serif" font-weight="700" '
+        f'font-size="14" fill="{bg_deep}">{safe_logo}</text>\n'
+        '</svg>\n'
+    )
+
+
+# Below this many pages per worker, process pool startup and pickling cost
+# more than parsing/rendering the pages in-process.
+_MIN_PAGES_PER_JOB = 8
+
+# Tasks in flight per worker process; bounds how many page sources and
+# results are held in memory at once
+_TASKS_PER_JOB = 4
+
+# Per-process page build inputs, set by _init_pages() so each worker
+# receives the compiled template once instead of once per page.
+_page_state = {}
+
+
+def _init_pages(compiled, parse_cache, site_output, icon_set, site_icons, profile=False, navs=None):
+    _page_state.update(compiled=compiled, parse_cache=parse_cache, site_output=site_output, profile=profile, navs=navs,
+                       icon_set=icon_set, site_icons=site_icons)
+
+
+def _build_page(task):
+    """Parse, index and (if stale) render one page.
+
+    task is (html_filename, source, source_hash, document, stale, keep):
+    *document* is the parsed page if the caller has it in memory, otherwise
+    it comes from the parse cache or is parsed (and cached), and *keep*
+    returns it to the caller. A page that had to be parsed is always
+    re-rendered.
+
+    Returns (html_filename, search entries, output, document or None,
+    profile record or None), where *output* is None if the page wasn't
+    rendered, else (hash, written) for the staged file. Nothing else of
+    the page is kept once its output is staged.
+    """
+    html_filename, source, source_hash, document, stale, keep = task
+    parse_cache = _page_state["parse_cache"]
+    timer = profile_mod.PageTimer() if _page_state["profile"] else profile_mod.NO_TIMER
+    if document is None:
+        key = parse_cache.key(source_hash)
+        document = parse_cache.load(key)
+        if document is not None:
+            timer.read(parse_cache.path(key))
+        timer.lap("load")
+        if document is None:
+            document = parser_mod.parse_document(source, timer.components)
+            timer.lap("parse")
+            parse_cache.save(key, document)
+            timer.lap("cache")
+            stale = True
+
+    marks = []
+    html_content = document.render(marks)
+    timer.lap("render")
+    entries = search_mod.page_entries(html_filename, html_content, marks)
+    timer.lap("index")
+    output = None
+    if stale:
+        site_output = _page_state["site_output"]
+        page_nav = ""
+        if _page_state["navs"] is not None:
+            page_navs, default_nav = _page_state["navs"]
+            page_nav = page_navs.get(html_filename, default_nav)
+        toc = renderer_mod.build_toc_html(document.headings())
+        html_content, icons = icons_mod.inline_page(_page_state["icon_set"], html_content, _page_state["site_icons"])
+        page_html = renderer_mod.render_compiled(_page_state["compiled"], html_content, page_nav, icons, toc)
+        written = site_output.put(html_filename, page_html.encode("utf-8"))
+        if written:
+            timer.wrote(site_output.path(html_filename))
+        timer.lap("write")
+        output = (site_output.files[html_filename], written)
+    return html_filename, entries, output, document if keep else None, timer.result()
+
+
+def _ignore(arg):
+    """Stand-in for the Profile methods when the build isn't profiled."""
+
+
+def _build_page_at(item):
+    """_build_page() for an (index, task) pair; returns (index, result)."""
+    i, task = item
+    return i, _build_page(task)
+
+
+def _map_pages(func, items, count, jobs, initializer=None, initargs=(), on_pool=None):
+    """Apply *func* to the *count* *items* in order, yielding the results,
+    over a process pool when worthwhile. *on_pool* is called before the
+    first item goes to the pool.
+
+    Results come back in input order, so a parallel build produces exactly
+    the same output as a serial one. *items* is consumed lazily and only a
+    few tasks per worker are in flight at a time.
+    """
+    if jobs > 1 and count >= 2 * _MIN_PAGES_PER_JOB:
+        # Imported here: it pulls in multiprocessing, which serial builds never need
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(jobs, count // _MIN_PAGES_PER_JOB)
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+            pending = deque()
+            for item in items:
+                if on_pool is not None:
+                    on_pool()
+                    on_pool = None
+                pending.append(pool.submit(func, item))
+                if len(pending) >= workers * _TASKS_PER_JOB:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        return
+    if initializer is not None:
+        initializer(*initargs)
+    for item in items:
+        yield func(item)
+
+
+def build(project_dir, output_dir=None, full=False, jobs=1, cache=None, on_pages_written=None, profile=None,
+          parse_cache=None, precompress=False):
     """Build the documentation site.
 
+    By default the build is incremental: a manifest of input hashes from the
+    previous build (see manifest.py) decides which pages are re-rendered.
+    Outputs are staged next to output_dir and only those whose content
+    changed are moved into place, file by file (see output.py). Pages are
+    only parsed when the parse cache (see cache.py) has no entry for their
+    source, which it can have even on a first build.
+
     Args:
         project_dir: Directory containing docs.yaml and pages/
         output_dir: Output directory (default: project_dir/_site)
+        full: Ignore the manifest and rebuild everything
+        jobs: Number of worker processes for parsing and rendering
+              (0 = one per CPU; small sites always build in-process)
+        cache: Dict kept between builds by a long-running process (serve
+               --watch); holds parsed documents and search entries in
+               memory so a rebuild only touches what changed. Without it,
+               pages are streamed: each page is dropped once it is written
+               and only its search entries are kept
+        on_pages_written: Called with the list of re-rendered HTML files as
+               soon as they are published, before the search index is rebuilt
+        profile: A profile.Profile to record phase and page timings in
+        parse_cache: The cache.ParseCache to load parsed pages from and
+               save them to (default: cache.resolve(project_dir), i.e.
+               PHOSPHOR_CACHE_DIR or .phosphor/parsed/)
+        precompress: Also write compressed siblings (.gz, and .br and .zst
+               when available) of the text outputs, see output.py
     """
+    lap = profile.lap if profile is not None else _ignore
+    lap("config")
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    encoders = output_mod.compressors() if precompress else []
+    keep_documents = cache is not None
+    if cache is None:
+        cache = {}
+    documents = cache.setdefault("documents", {})
+    search_cache = cache.setdefault("search", {})
+
     project_dir = os.path.abspath(project_dir)
+    if parse_cache is None:
+        try:
+            parse_cache = cache_mod.resolve(project_dir)
+        except ValueError as e:
+            print(f"Error: {cache_mod.CACHE_SIZE_ENV}: {e}", file=sys.stderr)
+            sys.exit(1)
     if output_dir is None:
         output_dir = os.path.join(project_dir, "_site")
+    output_dir = os.path.abspath(output_dir)
 
     # Find phosphor root (where templates/ and theme/ live)
     phosphor_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,31 +257,55 @@ def build(project_dir, output_dir=None):
         sys.exit(1)
     with open(template_path, "r") as f:
         template = f.read()
-
-    # Load search.js template
-    search_js_path = os.path.join(phosphor_root, "theme", "search.js")
-    if not os.path.exists(search_js_path):
-        print(f"Error: search.js template not found: {search_js_path}", file=sys.stderr)
+    if profile is not None:
+        profile.read(config_path)
+        profile.read(template_path)
+
+    lap("manifest")
+    # Hash every build input and compare against the previous manifest.
+    # Pages are re-rendered only when their source changes; a change to the
+    # config (site, theme, nav), the base template or the icon set
+    # re-renders every page.
+    theme_dir = os.path.join(phosphor_root, "theme")
+    inputs = {
+        "config": manifest_mod.hash_file(config_path),
+        "template": manifest_mod.hash_text(template),
+    }
+    for fname in _THEME_ASSETS:
+        inputs[fname] = manifest_mod.hash_file(os.path.join(theme_dir, fname))
+    icon_set = icons_mod.IconSet(icons_mod.icon_dir())
+    inputs["icons"] = icon_set.fingerprint()
+
+    previous = None
+    if not full and os.path.isdir(output_dir):
+        previous = manifest_mod.load_manifest(project_dir, output_dir)
+    manifest = manifest_mod.new_manifest(output_dir)
+    manifest["inputs"] = inputs
+
+    if previous is None:
+        # Everything is rebuilt; hash what is in output_dir now so files that
+        # come out the same are still kept
+        previous = manifest_mod.new_manifest(output_dir)
+        if os.path.isdir(output_dir):
+            previous["outputs"] = output_mod.hash_tree(output_dir)
+    site_output = output_mod.SiteOutput(output_dir, previous["outputs"])
+    try:
+        site_output.start()
+    except OSError as e:
+        print(f"Error: cannot create staging directory: {e}", file=sys.stderr)
         sys.exit(1)
-    with open(search_js_path, "r") as f:
-        search_js_template = f.read()
 
-    # Clean and create output directory
-    if os.path.exists(output_dir):
-        try:
-            shutil.rmtree(output_dir)
-        except PermissionError as e:
-            print(f"Error: cannot remove output directory: {e}", file=sys.stderr)
-            sys.exit(1)
-    os.makedirs(output_dir)
-    os.makedirs(os.path.join(output_dir, "assets"))
-
-    # Copy theme assets
-    theme_dir = os.path.join(phosphor_root, "theme")
-    for fname in ("style.css", "script.js"):
+    # Copy theme assets, each under a name fingerprinted with its content
+    # hash so it can be cached indefinitely
+    lap("assets")
+    wrote = profile.wrote if profile is not None else _ignore
+    assets = {}
+    for fname in _THEME_ASSETS:
         src = os.path.join(theme_dir, fname)
         if os.path.exists(src):
-            shutil.copy2(src, os.path.join(output_dir, "assets", fname))
+            assets[fname] = renderer_mod.asset_filename(fname, inputs[fname])
+            if site_output.copy(f"assets/{assets[fname]}", src, inputs[fname]):
+                wrote(site_output.path(f"assets/{assets[fname]}"))
 
     # Generate themed favicon
     custom_favicon = cfg["site"].get("favicon", "")
@@ -85,53 +316,37 @@ def build(project_dir, output_dir=None):
             print(f"  Error: favicon path escapes project directory: {custom_favicon}", file=sys.stderr)
             sys.exit(1)
         if os.path.exists(custom_path):
-            shutil.copy2(custom_path, os.path.join(output_dir, "assets", "favicon.svg"))
+            inputs["favicon"] = manifest_mod.hash_file(custom_path)
+            assets["favicon.svg"] = renderer_mod.asset_filename("favicon.svg", inputs["favicon"])
+            if site_output.copy(f"assets/{assets['favicon.svg']}", custom_path, inputs["favicon"]):
+                wrote(site_output.path(f"assets/{assets['favicon.svg']}"))
         else:
             print(f"  Warning: favicon not found: {custom_favicon}", file=sys.stderr)
     else:
         # Generate favicon from theme colors and logo_text
-        theme = cfg.get("theme", {})
-        accent = theme.get("accent", "#22d3a7")
-        accent_dim = theme.get("accent_dim", "#1a9e7e")
-        bg_deep = theme.get("bg_deep", "#080c14")
-        logo_text = cfg["site"].get("logo_text", "PD")
-
-        # Validate that color values look safe before injecting into SVG
-        for color_name, color_val in [("accent", accent), ("accent_dim", accent_dim), ("bg_deep", bg_deep)]:
-            if not _COLOR_RE.match(str(color_val)):
-                print(f"  Error: invalid theme color for {color_name}: {color_val!r}", file=sys.stderr)
-                sys.exit(1)
-
-        from . renderer import _escape
-        safe_logo = _escape(str(logo_text))
-
-        favicon_svg = (
-            '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 32 32">\n'
-            '  <defs>\n'
-            '    <linearGradient id="g" x1="0" y1="0" x2="1" y2="1">\n'
-            f'      <stop offset="0%" stop-color="{accent}"/>\n'
-            f'      <stop offset="100%" stop-color="{accent_dim}"/>\n'
-            '    </linearGradient>\n'
-            '  </defs>\n'
-            f'  <rect width="32" height="32" rx="6" fill="url(#g)"/>\n'
-            f'  <text x="16" y="22" text-anchor="middle" '
-            f'font-family="system-ui,sans-serif" font-weight="700" '
-            f'font-size="14" fill="{bg_deep}">{safe_logo}</text>\n'
-            '</svg>\n'
-        )
-
-        favicon_path = os.path.join(output_dir, "assets", "favicon.svg")
-        with open(favicon_path, "w") as f:
-            f.write(favicon_svg)
-
-    # Parse all pages
-    pages_data = []
+        svg = favicon_svg(cfg)
+        assets["favicon.svg"] = renderer_mod.asset_filename("favicon.svg", manifest_mod.hash_text(svg))
+        if site_output.put(f"assets/{assets['favicon.svg']}", svg.encode("utf-8")):
+            wrote(site_output.path(f"assets/{assets['favicon.svg']}"))
+
+    # Every page links the assets by name, so new asset names re-render
+    # every page, as does a change to the config or the template
+    inputs["assets"] = manifest_mod.hash_text(" ".join(sorted(assets.values())))
+    prev_inputs = previous["inputs"]
+    render_all = (
+        prev_inputs.get("config") != inputs["config"]
+        or prev_inputs.get("template") != inputs["template"]
+        or prev_inputs.get("assets") != inputs["assets"]
+        or prev_inputs.get("icons") != inputs["icons"]
+    )
+
+    lap("pages")
     pages_dir = os.path.join(project_dir, "pages")
-
     if not os.path.isdir(pages_dir):
         print(f"Error: pages/ directory not found at {pages_dir}", file=sys.stderr)
         sys.exit(1)
 
+    page_files = []
     for page_file in cfg["pages"]:
         page_path = os.path.join(pages_dir, page_file)
         if not _is_safe_path(page_path, pages_dir):
@@ -140,46 +355,147 @@ def build(project_dir, output_dir=None):
         if not os.path.exists(page_path):
             print(f"  Warning: Page not found: {page_file}", file=sys.stderr)
             continue
-
-        with open(page_path, "r") as f:
-            md_content = f.read()
-
-        html_content, headings = parser_mod.parse_markdown(md_content)
-        html_filename = page_file.replace(".md", ".html")
-
-        pages_data.append({
-            "filename": html_filename,
-            "md_file": page_file,
-            "headings": headings,
-            "html": html_content,
-        })
-
-    # Build search index
-    index_json = search_mod.build_search_index(pages_data)
-    search_js_final = search_mod.inject_search_index(search_js_template, index_json)
-
-    # Write search.js with injected index
-    with open(os.path.join(output_dir, "assets", "search.js"), "w") as f:
-        f.write(search_js_final)
-
-    # Build nav HTML (same for all pages)
-    nav_html = renderer_mod.build_nav_html(cfg["nav"], "")
-
-    # Render and write each page
-    for page in pages_data:
-        page_output = renderer_mod.render_page(
-            template,
-            cfg,
-            page["html"],
-            nav_html,
-            page["filename"],
-        )
-
-        out_path = os.path.join(output_dir, page["filename"])
-        with open(out_path, "w") as f:
-            f.write(page_output)
-
-        print(f"  Built: {page['filename']}")
+        page_files.append(page_file)
+
+    # Build nav HTML and fill it and the other site-wide values into the
+    # template once. With shared_nav the full nav goes out once, as a
+    # fragment every page loads, and pages only carry the nav group they
+    # are in. Icons are inlined as <svg><use>, from a sprite on each page
+    # (see icons.py).
+    navs = None
+    site_icons = set()
+    if cfg["site"].get("shared_nav"):
+        nav_name, nav_html, page_navs, default_nav = renderer_mod.build_shared_nav(cfg["nav"], icon_set, site_icons)
+        if site_output.put(f"assets/{nav_name}", nav_html.encode("utf-8")):
+            wrote(site_output.path(f"assets/{nav_name}"))
+        navs = (page_navs, default_nav)
+        assets["nav.html"] = nav_name
+        compiled = renderer_mod.compile_template(template, cfg, None, assets)
+    else:
+        nav_html = renderer_mod.build_nav_html(cfg["nav"], "")
+        compiled = renderer_mod.compile_template(template, cfg, nav_html, assets)
+    compiled, template_icons = icons_mod.inline_compiled(compiled, icon_set)
+    site_icons |= template_icons
+
+    # Parse, index and render page by page (in parallel when --jobs allows).
+    # Sources are read as the workers need them, and each page's document
+    # and HTML are dropped once its output is staged: only its search
+    # entries are kept. Pages are parsed only on a parse cache miss and
+    # re-rendered only when stale (changed since the manifest was written).
+    pages_entries = [None] * len(page_files)
+    page_keys = []
+    page_reads = {}  # page index -> (seconds, bytes), when profiling
+
+    def page_tasks():
+        for i, page_file in enumerate(page_files):
+            start = time.perf_counter()
+            with open(os.path.join(pages_dir, page_file), "r") as f:
+                md_content = f.read()
+                if profile is not None:
+                    page_reads[i] = (time.perf_counter() - start, os.fstat(f.fileno()).st_size)
+            source_hash = manifest_mod.hash_text(md_content)
+            html_filename = page_file.replace(".md", ".html")
+            manifest["pages"][page_file] = {"source": source_hash, "output": html_filename}
+            page_keys.append((html_filename, source_hash))
+
+            prev_page = previous["pages"].get(page_file)
+            unchanged = prev_page is not None and prev_page.get("source") == source_hash
+            stale = render_all or not unchanged or not site_output.keep(html_filename)
+            if not stale and (html_filename, source_hash) in search_cache:
+                # Already indexed in this process and output is current
+                pages_entries[i] = search_cache[(html_filename, source_hash)]
+                continue
+            yield i, (html_filename, md_content, source_hash, documents.get(source_hash), stale, keep_documents)
+
+    built = []
+    results = _map_pages(
+        _build_page_at,
+        page_tasks(),
+        len(page_files),
+        jobs,
+        initializer=_init_pages,
+        initargs=(compiled, parse_cache, site_output, icon_set, frozenset(site_icons), profile is not None, navs),
+        on_pool=profile.workers_started if profile is not None else None,
+    )
+    for i, (html_filename, entries, output, document, record) in results:
+        pages_entries[i] = entries
+        if record is not None:
+            profile.add_page(html_filename, record, *page_reads.pop(i))
+        if keep_documents:
+            search_cache[page_keys[i]] = entries
+            documents[page_keys[i][1]] = document
+        if output is not None:
+            site_output.add_page(html_filename, *output)
+            built.append(html_filename)
+            print(f"  Built: {html_filename}")
+    rendered = len(built)
+    compressed = []
+
+    def stage_compressed():
+        for rel in site_output.precompress(encoders, jobs):
+            wrote(site_output.path(rel))
+            compressed.append(rel)
+
+    if encoders:
+        # Pages and assets are published together with their siblings
+        lap("compress")
+        stage_compressed()
+    try:
+        site_output.publish()
+    except OSError as e:
+        print(f"Error: cannot write to output directory: {e}", file=sys.stderr)
+        sys.exit(1)
+    if on_pages_written is not None:
+        on_pages_written(built)
+
+    if keep_documents:
+        current = set(page_keys)
+        for key in search_cache.keys() - current:
+            del search_cache[key]
+        cache["documents"] = {h: documents[h] for _, h in current if h in documents}
+
+    # Build search index: a content-hashed file, plus the small pointer file
+    # search.js reads to find it, staged after the index and its siblings.
+    # Then the asset manifest, which names the current file of every asset.
+    lap("search")
+    index_json = search_mod.build_search_index(pages_entries)
+    index_name = search_mod.index_filename(index_json)
+    assets["search-index.json"] = index_name
+    for fname, content in (
+        (index_name, index_json),
+        ("search-index.json", search_mod.index_pointer(index_name)),
+        (ASSET_MANIFEST, asset_manifest(assets)),
+    ):
+        if site_output.put(f"assets/{fname}", content.encode("utf-8")):
+            wrote(site_output.path(f"assets/{fname}"))
+        if encoders:
+            stage_compressed()
+
+    # Publish the index, then remove what this build didn't produce: outputs
+    # of pages dropped from the config and superseded index files
+    lap("cleanup")
+    try:
+        deploy = site_output.commit()
+    except OSError as e:
+        print(f"Error: cannot write to output directory: {e}", file=sys.stderr)
+        sys.exit(1)
+    for rel in sorted(deploy["removed"]):
+        if rel.endswith(".html"):
+            print(f"  Removed: {rel}")
+
+    manifest["outputs"] = site_output.files
+    manifest_mod.save_manifest(project_dir, manifest)
+    manifest_mod.save_deploy_manifest(project_dir, deploy)
+    parse_cache.evict()
+    lap(None)
+    if profile is not None:
+        profile.meta.update(project=project_dir, jobs=jobs, full=full, page_count=len(page_files), rendered=rendered)
 
     print(f"\nSite built to {output_dir}/")
-    print(f"  {len(pages_data)} pages, {len(pages_data)} HTML files")
+    print(f"  {len(page_files)} pages, {len(page_files)} HTML files")
+    if rendered < len(page_files):
+        print(f"  {len(page_files) - rendered} unchanged pages skipped (use --full to rebuild everything)")
+    if encoders:
+        suffixes = ", ".join(suffix for suffix, _ in encoders)
+        print(f"  Precompressed ({suffixes}): {len(compressed)} files written")
+    print(f"  Files: {len(deploy['added'])} added, {len(deploy['changed'])} changed, {len(deploy['removed'])} removed")
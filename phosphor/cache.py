@@ -0,0 +1,162 @@
+"""Content-addressed parse cache for phosphor-docs builds.
+
+Maps a page's Markdown source to its parsed document tree, keyed by a hash
+of the source and of the parser code itself, so an entry is valid in any
+checkout that has the same page and the same parser: a fresh clone in CI
+whose cache directory was restored from an earlier run only parses the pages
+that changed. Entries are compact JSON (Document.to_data()), zlib-compressed,
+one file per key, written atomically.
+
+The cache is bounded in size. Every hit refreshes the entry's mtime, and
+evict() deletes the least recently used entries until the total fits.
+
+The directory is, in order of precedence: the build's --cache-dir, the
+PHOSPHOR_CACHE_DIR environment variable, or .phosphor/parsed/ in the project.
+The size limit comes from --cache-size or PHOSPHOR_CACHE_SIZE (in MB).
+"""
+
+import hashlib
+import json
+import math
+import os
+import zlib
+
+from . import __version__
+from . import document as document_mod
+from . import manifest as manifest_mod
+from . import parser as parser_mod
+
+
+CACHE_DIR_ENV = "PHOSPHOR_CACHE_DIR"
+CACHE_SIZE_ENV = "PHOSPHOR_CACHE_SIZE"
+
+DEFAULT_SIZE_MB = 256
+
+_SUFFIX = ".json.z"
+
+_parser_version = None
+
+
+def parser_version():
+    """Return a hash identifying the parser: its code and the tree format.
+
+    Any edit to parser.py or document.py, or a new release, changes every
+    cache key, so a cache is never read by a parser that would produce
+    different output.
+    """
+    global _parser_version
+    if _parser_version is None:
+        h = hashlib.sha256(__version__.encode("utf-8"))
+        for module in (parser_mod, document_mod):
+            try:
+                with open(module.__file__, "rb") as f:
+                    h.update(f.read())
+            except OSError:
+                pass
+        _parser_version = h.hexdigest()
+    return _parser_version
+
+
+class ParseCache:
+    """The parse cache in *directory*, holding at most *max_bytes*.
+
+    With directory=None the cache is disabled: nothing is found or stored.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_SIZE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, source_hash):
+        """Return the cache key for a page whose source hashes to *source_hash*."""
+        return hashlib.sha256(f"{parser_version()}:{source_hash}".encode("ascii")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def load(self, key):
+        """Return the cached Document for *key*, or None."""
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(zlib.decompress(f.read()))
+            document = document_mod.Document.from_data(data)
+        except (OSError, ValueError, KeyError, TypeError, IndexError, zlib.error):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return document
+
+    def save(self, key, document):
+        """Store the document tree of a page under *key*."""
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # Build workers, or builds sharing the cache, may save the same page
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        data = json.dumps(document.to_data(), separators=(",", ":")).encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(data, 1))
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits its size.
+
+        Returns the number of entries deleted.
+        """
+        if self.directory is None:
+            return 0
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(_SUFFIX):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError:
+            return 0
+        deleted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+        return deleted
+
+
+def resolve(project_dir, cache_dir=None, size_mb=None):
+    """Return the ParseCache for a build, applying the environment defaults.
+
+    Raises ValueError for a size that isn't a positive, finite number.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_DIR_ENV)
+        if cache_dir:
+            cache_dir = os.path.expanduser(cache_dir)
+        else:
+            cache_dir = os.path.join(manifest_mod.state_dir(project_dir), "parsed")
+    if size_mb is None:
+        size_mb = os.environ.get(CACHE_SIZE_ENV) or DEFAULT_SIZE_MB
+    try:
+        size = float(size_mb)
+    except ValueError:
+        size = math.nan
+    # Also rejects inf, which int() below can't convert, and nan
+    if not 0 < size < math.inf:
+        raise ValueError(f"cache size must be a positive number of MB, got {size_mb!r}")
+    return ParseCache(os.path.abspath(cache_dir), int(size * 1024 * 1024))
@@ -5,16 +5,17 @@ Commands:
     phosphor build [dir]   — Build the documentation site
     phosphor init [dir]    — Scaffold a new docs project
     phosphor serve [dir]   — Preview with local HTTP server
+    phosphor bench         — Benchmark the build pipeline
 """
 
 import argparse
-import http.server
 import os
 import re
-import shutil
-import subprocess
 import sys
 
+# Commands import the modules they need when they run, so that startup only
+# pays for argparse and the command that was asked for.
+
 
 def _detect_git_info(directory):
     """Detect GitHub repo info from git remote origin.
@@ -22,6 +23,8 @@ def _detect_git_info(directory):
     Returns dict with title, tagline, logo_text, github URL,
     or empty dict if not a git repo or no remote found.
     """
+    import subprocess
+
     try:
         result = subprocess.run(
             ["git", "remote", "get-url", "origin"],
@@ -75,16 +78,50 @@ def cmd_build(args):
     from . import build as build_mod
 
     project_dir = args.dir or "."
+    if args.jobs < 0:
+        print(f"Error: --jobs must be 0 or a positive number, got {args.jobs}", file=sys.stderr)
+        sys.exit(1)
+
+    from . import cache as cache_mod
+    if args.no_cache:
+        parse_cache = cache_mod.ParseCache(None)
+    else:
+        try:
+            parse_cache = cache_mod.resolve(os.path.abspath(project_dir), args.cache_dir, args.cache_size)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    profile = None
+    if args.profile is not None:
+        from . import profile as profile_mod
+        profile = profile_mod.Profile()
+
     print(f"Building site from {os.path.abspath(project_dir)}...")
     try:
-        build_mod.build(project_dir)
+        build_mod.build(project_dir, full=args.full, jobs=args.jobs, profile=profile, parse_cache=parse_cache,
+                        precompress=args.precompress)
     except Exception as e:
         print(f"Error: Build failed: {e}", file=sys.stderr)
         sys.exit(1)
 
+    if profile is not None:
+        from . import manifest as manifest_mod
+        report_path = args.profile or os.path.join(manifest_mod.state_dir(os.path.abspath(project_dir)), "profile.json")
+        profile.finish()
+        print("\n".join(profile.summary()))
+        try:
+            profile.save(report_path)
+        except OSError as e:
+            print(f"Error: cannot write profile report: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nProfile report written to {report_path}")
+
 
 def cmd_init(args):
     """Scaffold a new docs project."""
+    import shutil
+
     target_dir = args.dir or "."
     target_dir = os.path.abspath(target_dir)
 
@@ -167,7 +204,9 @@ def cmd_init(args):
 
 def cmd_serve(args):
     """Start a local HTTP server for preview."""
+    import threading
     from . import build as build_mod
+    from . import server as server_mod
 
     project_dir = args.dir or "."
     site_dir = os.path.join(os.path.abspath(project_dir), "_site")
@@ -177,36 +216,43 @@ def cmd_serve(args):
         print(f"Error: port must be between 1 and 65535, got {port}", file=sys.stderr)
         sys.exit(1)
 
-    # Build first
-    print(f"Building site from {os.path.abspath(project_dir)}...")
-    try:
-        build_mod.build(project_dir)
-    except Exception as e:
-        print(f"Error: Build failed: {e}", file=sys.stderr)
-        sys.exit(1)
-    print()
-
-    if not os.path.exists(site_dir):
-        print("Error: _site/ directory not found. Build failed?", file=sys.stderr)
+    if args.on_demand and args.precompress:
+        print("Error: --precompress writes _site/, which --on-demand doesn't build", file=sys.stderr)
         sys.exit(1)
 
-    print(f"Serving at http://localhost:{port}")
-    print("Press Ctrl+C to stop.\n")
-
-    os.chdir(site_dir)
-
-    class _Handler(http.server.SimpleHTTPRequestHandler):
-        # Add SVG MIME type
-        extensions_map = {
-            **http.server.SimpleHTTPRequestHandler.extensions_map,
-            ".svg": "image/svg+xml",
-        }
-
-        def log_message(self, fmt, *a):
-            print(f"  {a[0]} {a[1]}")
+    cache = {}
+    site = None
+    if args.on_demand:
+        # Render pages as they are requested; nothing is built up front
+        from . import devserver as devserver_mod
+        site = devserver_mod.OnDemandSite(project_dir)
+        try:
+            site.get("/")  # fail early on a broken docs.yaml
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        # Build first. In watch mode the parsed pages stay in memory for the
+        # rebuilds that follow.
+        print(f"Building site from {os.path.abspath(project_dir)}...")
+        try:
+            build_mod.build(project_dir, cache=cache, precompress=args.precompress)
+        except Exception as e:
+            print(f"Error: Build failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        print()
+
+        if not os.path.exists(site_dir):
+            print("Error: _site/ directory not found. Build failed?", file=sys.stderr)
+            sys.exit(1)
+
+    reload = None
+    if args.watch:
+        from . import watch as watch_mod
+        reload = watch_mod.LiveReload()
 
     try:
-        server = http.server.HTTPServer(("", port), _Handler)
+        server = server_mod.make_server(port, site_dir, reload, site)
     except OSError as e:
         if "Address already in use" in str(e) or "address already in use" in str(e):
             print(f"Error: port {port} is already in use. Try a different port with -p.", file=sys.stderr)
@@ -214,6 +260,17 @@ def cmd_serve(args):
             print(f"Error: cannot start server: {e}", file=sys.stderr)
         sys.exit(1)
 
+    print(f"Serving at http://localhost:{port}")
+    print("Press Ctrl+C to stop.\n")
+
+    if reload is not None:
+        watcher = threading.Thread(
+            target=watch_mod.rebuild_forever,
+            args=(project_dir, reload, cache, site is None, args.precompress),
+            daemon=True,
+        )
+        watcher.start()
+
     try:
         server.serve_forever()
     except KeyboardInterrupt:
@@ -221,6 +278,96 @@ def cmd_serve(args):
         server.server_close()
 
 
+def cmd_bench(args):
+    """Benchmark the build pipeline on a generated project."""
+    import json
+    import tempfile
+    from . import bench as bench_mod
+
+    for name, value, minimum in (("--pages", args.pages, 1), ("--page-size", args.page_size, 1), ("--repeat", args.repeat, 1)):
+        if value < minimum:
+            print(f"Error: {name} must be at least {minimum}, got {value}", file=sys.stderr)
+            sys.exit(1)
+    if not 0 <= args.heading_density <= 1:
+        print(f"Error: --heading-density must be between 0 and 1, got {args.heading_density}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        mix = bench_mod.parse_mix(args.mix)
+    except ValueError as e:
+        print(f"Error: --mix: {e}", file=sys.stderr)
+        sys.exit(1)
+    only = [name.strip() for name in args.only.split(",")] if args.only else list(bench_mod.BENCHMARKS)
+    unknown = [name for name in only if name not in bench_mod.BENCHMARKS]
+    if unknown:
+        print(f"Error: unknown benchmark {unknown[0]!r} (choose from {', '.join(bench_mod.BENCHMARKS)})", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot read baseline: {e}", file=sys.stderr)
+            sys.exit(1)
+    if args.keep and os.path.isdir(args.keep) and os.listdir(args.keep):
+        print(f"Error: {args.keep} is not empty", file=sys.stderr)
+        sys.exit(1)
+
+    corpus = {
+        "pages": args.pages,
+        "page_size": args.page_size,
+        "heading_density": args.heading_density,
+        "mix": mix,
+        "seed": args.seed,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        project_dir = os.path.abspath(args.keep or tmp)
+        corpus["bytes"] = bench_mod.generate_project(project_dir, **{k: v for k, v in corpus.items() if k != "bytes"})
+        print(f"Generated {args.pages} pages ({corpus['bytes'] / 1e6:.1f} MB of Markdown) in {project_dir}")
+        if baseline is not None:
+            # Timings on another corpus can't be compared: stop before running them
+            try:
+                bench_mod.check_corpus(corpus, baseline)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                sys.exit(1)
+        print(f"Running {', '.join(only)} ({args.repeat} runs each)...\n")
+        results = bench_mod.run(project_dir, args.repeat, only)
+    report = bench_mod.report(corpus, results, args.repeat)
+
+    base_results = (baseline or {}).get("results", {})
+    print(f"  {'benchmark':<10} {'min':>10} {'median':>10} {'per page':>10}" + (f" {'baseline':>10}" if baseline else ""))
+    for name, r in report["results"].items():
+        line = f"  {name:<10} {r['min'] * 1000:>7.1f} ms {r['median'] * 1000:>7.1f} ms {r['min'] * 1000 / args.pages:>7.2f} ms"
+        if name in base_results:
+            line += f" {(r['min'] / base_results[name]['min'] - 1) * 100:>+9.1f}%"
+        print(line)
+
+    if args.output:
+        try:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+        except OSError as e:
+            print(f"Error: cannot write results: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nResults written to {args.output}")
+
+    if baseline is not None:
+        try:
+            regressions = bench_mod.compare(report, baseline, args.threshold / 100)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if regressions:
+            for name, before, after in regressions:
+                print(f"Error: {name} regressed: {before * 1000:.1f} ms -> {after * 1000:.1f} ms "
+                      f"(+{(after / before - 1) * 100:.0f}%, threshold {args.threshold:g}%)", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:g}%)")
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog="phosphor",
@@ -231,6 +378,13 @@ def main():
     # build
     build_parser = subparsers.add_parser("build", help="Build the documentation site")
     build_parser.add_argument("dir", nargs="?", default=".", help="Project directory (default: .)")
+    build_parser.add_argument("--full", action="store_true", help="Ignore the build manifest and re-render every page (the parse cache is still used; see --no-cache)")
+    build_parser.add_argument("-j", "--jobs", type=int, default=1, help="Parse and render pages in N processes (0 = one per CPU, default: 1)")
+    build_parser.add_argument("--cache-dir", metavar="DIR", help="Parse cache directory, e.g. one shared between checkouts or restored in CI (default: $PHOSPHOR_CACHE_DIR or .phosphor/parsed)")
+    build_parser.add_argument("--cache-size", metavar="MB", help="Size limit of the parse cache; least recently used entries are evicted (default: $PHOSPHOR_CACHE_SIZE or 256)")
+    build_parser.add_argument("--no-cache", action="store_true", help="Parse every page without reading or writing the parse cache")
+    build_parser.add_argument("--precompress", action="store_true", help="Also write .gz (and .br/.zst when the brotli/zstd modules are installed) siblings of text files for the web server to send as they are")
+    build_parser.add_argument("--profile", nargs="?", const="", metavar="FILE", help="Time each build phase, page and ::: component; print a summary and save a JSON report to FILE (default: .phosphor/profile.json)")
 
     # init
     init_parser = subparsers.add_parser("init", help="Scaffold a new docs project")
@@ -240,6 +394,23 @@ def main():
     serve_parser = subparsers.add_parser("serve", help="Preview with local HTTP server")
     serve_parser.add_argument("dir", nargs="?", default=".", help="Project directory (default: .)")
     serve_parser.add_argument("-p", "--port", type=int, default=8000, help="Port number (default: 8000)")
+    serve_parser.add_argument("--on-demand", action="store_true", help="Render each page when it is requested instead of building _site/ first")
+    serve_parser.add_argument("--precompress", action="store_true", help="Build with --precompress, so compressed responses are sent from the precompressed files")
+    serve_parser.add_argument("-w", "--watch", action="store_true", help="Rebuild when pages, config, templates or theme change, and reload open pages")
+
+    # bench
+    bench_parser = subparsers.add_parser("bench", help="Benchmark the build pipeline on a generated project")
+    bench_parser.add_argument("--pages", type=int, default=100, help="Number of generated pages (default: 100)")
+    bench_parser.add_argument("--page-size", type=int, default=8, metavar="KB", help="Approximate Markdown size of each page in KB (default: 8)")
+    bench_parser.add_argument("--heading-density", type=float, default=0.25, metavar="P", help="Chance that a block starts a new section, 0-1 (default: 0.25)")
+    bench_parser.add_argument("--mix", default="", metavar="KIND=W,...", help="Block weights, e.g. cards=3,table=0 (kinds: paragraph, list, code, terminal, table, cards, command, callout)")
+    bench_parser.add_argument("--seed", type=int, default=1, help="Random seed for the generated pages (default: 1)")
+    bench_parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark; the fastest counts (default: 5)")
+    bench_parser.add_argument("--only", metavar="NAMES", help="Comma-separated benchmarks to run (parse, search, render, build, rebuild)")
+    bench_parser.add_argument("-o", "--output", metavar="FILE", help="Write the results as JSON (usable as a baseline)")
+    bench_parser.add_argument("--baseline", metavar="FILE", help="Fail if a benchmark is slower than in this earlier --output file")
+    bench_parser.add_argument("--threshold", type=float, default=20, metavar="PCT", help="Slowdown allowed against the baseline, in percent (default: 20)")
+    bench_parser.add_argument("--keep", metavar="DIR", help="Generate the project in DIR (must be empty) and keep it")
 
     args = parser.parse_args()
 
@@ -249,6 +420,8 @@ def main():
         cmd_init(args)
     elif args.command == "serve":
         cmd_serve(args)
+    elif args.command == "bench":
+        cmd_bench(args)
     else:
         parser.print_help()
         sys.exit(1)
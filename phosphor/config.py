@@ -4,6 +4,12 @@ import os
 import sys
 import yaml
 
+try:
+    # libyaml's loader builds the same objects as SafeLoader, several times faster
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 
 DEFAULTS = {
     "site": {
@@ -25,7 +31,7 @@ def load_config(config_path):
         raise FileNotFoundError(f"Config not found: {config_path}")
 
     with open(config_path, "r") as f:
-        raw = yaml.safe_load(f) or {}
+        raw = yaml.load(f, Loader=_SafeLoader) or {}
 
     if not isinstance(raw, dict):
         print(f"Error: docs.yaml must be a YAML mapping, got {type(raw).__name__}", file=sys.stderr)
@@ -0,0 +1,264 @@
+"""On-demand site for phosphor serve --on-demand.
+
+Instead of building _site/ up front, OnDemandSite answers each request from
+the project sources: a page is parsed and rendered when it is first asked
+for and kept in an LRU cache keyed by the page, its source hash and the
+site hash (docs.yaml, base.html, the asset file names and the icon set), so
+edits show up on the next request and the first page is served without
+touching the rest of the project. Assets are served under the same
+fingerprinted names as in a build. The search index, which needs every
+page, is only built when search.js asks for it. Nothing is written to disk.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote
+
+from . import build as build_mod
+from . import config as config_mod
+from . import icons as icons_mod
+from . import manifest as manifest_mod
+from . import parser as parser_mod
+from . import renderer as renderer_mod
+from . import search as search_mod
+
+
+# Rendered pages (and parsed documents) kept in memory
+CACHE_SIZE = 128
+
+
+class OnDemandSite:
+    """The pages and assets of a project, rendered on request."""
+
+    def __init__(self, project_dir, cache_size=CACHE_SIZE):
+        self.project_dir = os.path.abspath(project_dir)
+        self.pages_dir = os.path.join(self.project_dir, "pages")
+        self.config_path = os.path.join(self.project_dir, "docs.yaml")
+        phosphor_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.template_path = os.path.join(phosphor_root, "templates", "base.html")
+        self.theme_dir = os.path.join(phosphor_root, "theme")
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._site = None       # (stamp, site state) for the current config/template
+        self._rendered = OrderedDict()   # (page, source hash, site hash) -> page bytes
+        self._documents = OrderedDict()  # source hash -> Document
+        self._search_cache = {}          # (page file name, source hash) -> search entries
+        self._index = None      # (page sources, index file name, index bytes)
+
+    def get(self, url_path):
+        """Return (file name, body bytes, validator) for a URL path, or None.
+
+        The file name (relative to the site root) gives the content type;
+        the validator changes whenever the body does.
+        """
+        rel = unquote(url_path).lstrip("/")
+        if rel == "" or rel.endswith("/"):
+            rel += "index.html"
+        if rel.startswith("assets/"):
+            return self._asset(rel)
+        site = self._site_state()
+        page_file = site["pages"].get(rel)
+        if page_file is None:
+            return None
+        source = self._read_page(page_file)
+        if source is None:
+            return None
+        source_hash = manifest_mod.hash_text(source)
+
+        key = (rel, source_hash, site["hash"])
+        with self._lock:
+            body = self._rendered.get(key)
+            if body is not None:
+                self._rendered.move_to_end(key)
+        if body is None:
+            document = self._document(source_hash, source)
+            page_nav = ""
+            if site["navs"] is not None:
+                page_navs, default_nav = site["navs"]
+                page_nav = page_navs.get(rel, default_nav)
+            toc = renderer_mod.build_toc_html(document.headings())
+            content, icons = icons_mod.inline_page(site["icon_set"], document.to_html(), site["icons"])
+            body = renderer_mod.render_compiled(site["compiled"], content, page_nav, icons, toc).encode("utf-8")
+            with self._lock:
+                self._rendered[key] = body
+                while len(self._rendered) > self.cache_size:
+                    self._rendered.popitem(last=False)
+        return rel, body, f"{source_hash[:16]}-{site['hash'][:16]}"
+
+    def _site_state(self):
+        """Config, compiled template and asset names, reloaded when
+        docs.yaml, base.html, a theme file or the icon set change."""
+        icon_dir = icons_mod.icon_dir()
+        stamp = (_stamp(self.config_path), _stamp(self.template_path),
+                 *(_stamp(os.path.join(self.theme_dir, fname)) for fname in build_mod._THEME_ASSETS),
+                 _stamp(icon_dir), _stamp(os.path.join(icon_dir, "icons.json")))
+        with self._lock:
+            if self._site is not None and self._site[0] == stamp:
+                return self._site[1]
+
+        cfg = config_mod.load_config(self.config_path)
+        if not os.path.exists(self.template_path):
+            print(f"Error: base template not found: {self.template_path}", file=sys.stderr)
+            sys.exit(1)
+        with open(self.template_path, "r") as f:
+            template = f.read()
+
+        # The same asset names as build() gives them: asset name -> (file
+        # name, path to serve it from or None for the generated favicon)
+        assets = {}
+        for fname in build_mod._THEME_ASSETS:
+            path = os.path.join(self.theme_dir, fname)
+            if os.path.exists(path):
+                assets[fname] = (renderer_mod.asset_filename(fname, manifest_mod.hash_file(path)), path)
+        custom_favicon = cfg["site"].get("favicon", "")
+        if custom_favicon:
+            custom_path = os.path.join(self.project_dir, custom_favicon)
+            if not build_mod._is_safe_path(custom_path, self.project_dir):
+                print(f"  Error: favicon path escapes project directory: {custom_favicon}", file=sys.stderr)
+            elif os.path.exists(custom_path):
+                favicon_name = renderer_mod.asset_filename("favicon.svg", manifest_mod.hash_file(custom_path))
+                assets["favicon.svg"] = (favicon_name, custom_path)
+        else:
+            favicon_name = renderer_mod.asset_filename("favicon.svg", manifest_mod.hash_text(build_mod.favicon_svg(cfg)))
+            assets["favicon.svg"] = (favicon_name, None)
+        asset_names = {fname: name for fname, (name, _) in assets.items()}
+
+        icon_set = icons_mod.IconSet(icon_dir)
+        site_icons = set()
+        navs = nav_file = None
+        if cfg["site"].get("shared_nav"):
+            nav_name, nav_html, page_navs, default_nav = renderer_mod.build_shared_nav(cfg["nav"], icon_set, site_icons)
+            navs = (page_navs, default_nav)
+            nav_file = (nav_name, nav_html.encode("utf-8"))
+            compiled = renderer_mod.compile_template(template, cfg, None, asset_names)
+        else:
+            nav_html = renderer_mod.build_nav_html(cfg["nav"], "")
+            compiled = renderer_mod.compile_template(template, cfg, nav_html, asset_names)
+        compiled, template_icons = icons_mod.inline_compiled(compiled, icon_set)
+        site = {
+            "cfg": cfg,
+            "compiled": compiled,
+            "icon_set": icon_set,
+            "icons": site_icons | template_icons,  # icons of the template and nav, on every page
+            "navs": navs,          # (page navs, default nav) with shared_nav
+            "nav_file": nav_file,  # (file name, bytes) of the shared nav fragment
+            "assets": {name: (fname, path) for fname, (name, path) in assets.items()},  # file name -> (asset, path)
+            "hash": manifest_mod.hash_text(
+                manifest_mod.hash_file(self.config_path) + template + " ".join(sorted(asset_names.values()))
+                + icon_set.fingerprint()),
+            "pages": {p.replace(".md", ".html"): p for p in cfg["pages"]},
+        }
+        with self._lock:
+            self._site = (stamp, site)
+        return site
+
+    def _read_page(self, page_file):
+        """Return the Markdown source of a configured page, or None if it is missing."""
+        page_path = os.path.join(self.pages_dir, page_file)
+        if not build_mod._is_safe_path(page_path, self.pages_dir):
+            print(f"  Error: page path escapes pages/ directory: {page_file}", file=sys.stderr)
+            return None
+        try:
+            with open(page_path, "r") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _document(self, source_hash, source):
+        """Return the parsed page, parsing it unless it is cached."""
+        with self._lock:
+            document = self._documents.get(source_hash)
+            if document is not None:
+                self._documents.move_to_end(source_hash)
+                return document
+        document = parser_mod.parse_document(source)
+        with self._lock:
+            self._documents[source_hash] = document
+            limit = max(self.cache_size, len(self._site[1]["pages"]) if self._site else 0)
+            while len(self._documents) > limit:
+                self._documents.popitem(last=False)
+        return document
+
+    def _asset(self, rel):
+        name = rel[len("assets/"):]
+        site = self._site_state()
+        if name in site["assets"]:
+            fname, path = site["assets"][name]
+            if path is not None:
+                return _file_response(rel, path)
+            body = build_mod.favicon_svg(site["cfg"]).encode("utf-8")
+            return rel, body, hashlib.sha256(body).hexdigest()[:16]
+        if name == "search-index.json":
+            index_name, _ = self._search_index()
+            return rel, search_mod.index_pointer(index_name).encode("utf-8"), index_name
+        if name == build_mod.ASSET_MANIFEST:
+            index_name, _ = self._search_index()
+            assets = {fname: file_name for file_name, (fname, _) in site["assets"].items()}
+            if site["nav_file"] is not None:
+                assets["nav.html"] = site["nav_file"][0]
+            assets["search-index.json"] = index_name
+            body = build_mod.asset_manifest(assets).encode("utf-8")
+            return rel, body, hashlib.sha256(body).hexdigest()[:16]
+        nav_file = site["nav_file"]
+        if nav_file is not None and name == nav_file[0]:
+            return rel, nav_file[1], name
+        if build_mod._HASHED_INDEX_RE.match(name):
+            index_name, body = self._search_index()
+            if name == index_name:
+                return rel, body, index_name
+        return None
+
+    def _search_index(self):
+        """Return (file name, bytes) of the search index for the current sources.
+
+        Built on first use and again only after a page changes; every page
+        has to be parsed for it, so this is the one slow request.
+        """
+        site = self._site_state()
+        pages = []
+        for page_file in site["cfg"]["pages"]:
+            source = self._read_page(page_file)
+            if source is not None:
+                pages.append((page_file, source, manifest_mod.hash_text(source)))
+        key = tuple((page_file, source_hash) for page_file, _, source_hash in pages)
+        with self._lock:
+            if self._index is not None and self._index[0] == key:
+                return self._index[1], self._index[2]
+
+        pages_entries = []
+        for page_file, source, source_hash in pages:
+            filename = page_file.replace(".md", ".html")
+            with self._lock:
+                entries = self._search_cache.get((filename, source_hash))
+            if entries is None:
+                marks = []
+                html = self._document(source_hash, source).render(marks)
+                entries = search_mod.page_entries(filename, html, marks)
+            pages_entries.append(entries)
+        index_json = search_mod.build_search_index(pages_entries)
+        with self._lock:
+            self._search_cache = {(page_file.replace(".md", ".html"), source_hash): entries
+                                  for (page_file, _, source_hash), entries in zip(pages, pages_entries)}
+            self._index = (key, search_mod.index_filename(index_json), index_json.encode("utf-8"))
+            return self._index[1], self._index[2]
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _file_response(rel, path):
+    try:
+        with open(path, "rb") as f:
+            body = f.read()
+    except OSError:
+        return None
+    return rel, body, hashlib.sha256(body).hexdigest()[:16]
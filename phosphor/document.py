@@ -0,0 +1,190 @@
+"""Document tree for phosphor-docs pages.
+
+The parser builds a Document out of these nodes; the HTML serializer, the
+heading list (TOC) and the search indexer all read the tree instead of
+scanning generated HTML. Trees convert to and from plain lists
+(to_data()/from_data()) so they can be cached as JSON.
+"""
+
+import re
+from itertools import accumulate
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+class Section:
+    """A ## heading and everything up to the next one: <div class="section">."""
+    __slots__ = ("id", "html", "children")
+
+    def __init__(self, id, html, children=None):
+        self.id = id
+        self.html = html  # inline HTML of the heading
+        self.children = [] if children is None else children
+
+    def render(self, out, marks):
+        if marks is not None:
+            marks.append((len(out), None))
+        out.append(
+            f'<div class="section" id="{self.id}">\n'
+            f'  <span class="section-anchor"></span>\n'
+            f'  <h2>{self.html}</h2>'
+        )
+        if marks is not None and self.id:
+            marks.append((len(out), self))
+        out.append('\n  <hr class="section-rule">\n')
+        for child in self.children:
+            child.render(out, marks)
+        out.append("</div>\n")
+
+    def to_data(self):
+        return ["section", self.id, self.html, [c.to_data() for c in self.children]]
+
+
+class Heading:
+    """An ### (with id) or #### heading."""
+    __slots__ = ("level", "id", "html")
+
+    def __init__(self, level, id, html):
+        self.level = level
+        self.id = id
+        self.html = html
+
+    def render(self, out, marks):
+        if self.level == 3:
+            out.append(f'<h3 id="{self.id}">{self.html}</h3>')
+            if marks is not None and self.id:
+                marks.append((len(out), self))
+            out.append("\n")
+        else:
+            out.append(f'<h4>{self.html}</h4>\n')
+
+    def to_data(self):
+        return ["heading", self.level, self.id, self.html]
+
+
+class Paragraph:
+    """A paragraph; html is its inline content."""
+    __slots__ = ("html",)
+
+    def __init__(self, html):
+        self.html = html
+
+    def render(self, out, marks):
+        out.append(f"<p>{self.html}</p>\n")
+
+    def to_data(self):
+        return ["p", self.html]
+
+
+class Raw:
+    """Pre-rendered block HTML: lists, tables, code blocks, rules, HTML blocks."""
+    __slots__ = ("html",)
+
+    def __init__(self, html):
+        self.html = html
+
+    def render(self, out, marks):
+        out.append(self.html)
+
+    def to_data(self):
+        return ["raw", self.html]
+
+
+class Component:
+    """A ::: component. Callouts and accordions keep their parsed body as children
+    between the opening and closing HTML; other components are all opening HTML.
+    """
+    __slots__ = ("kind", "open_html", "children", "close_html")
+
+    def __init__(self, kind, open_html, children=None, close_html=""):
+        self.kind = kind
+        self.open_html = open_html
+        self.children = [] if children is None else children
+        self.close_html = close_html
+
+    def render(self, out, marks):
+        out.append(self.open_html)
+        for child in self.children:
+            child.render(out, marks)
+        out.append(self.close_html)
+
+    def to_html(self):
+        out = []
+        self.render(out, None)
+        return "".join(out)
+
+    def to_data(self):
+        return ["component", self.kind, self.open_html, [c.to_data() for c in self.children], self.close_html]
+
+
+class Document:
+    """The parsed page: a list of top-level nodes."""
+    __slots__ = ("children",)
+
+    def __init__(self, children=None):
+        self.children = [] if children is None else children
+
+    def render(self, marks=None):
+        """Serialize to HTML.
+
+        If *marks* is a list, (offset, node) pairs are appended to it: node
+        None at the offset where a section <div> starts, and a Section or h3
+        Heading at the offset just after its closing heading tag.
+        """
+        out = []
+        for child in self.children:
+            child.render(out, marks)
+        if marks:
+            offsets = list(accumulate(map(len, out), initial=0))
+            marks[:] = [(offsets[i], node) for i, node in marks]
+        return "".join(out)
+
+    def to_html(self):
+        return self.render()
+
+    def headings(self):
+        """Return the h2/h3 headings as {"level", "text", "id"} dicts, in page order."""
+        headings = []
+        _collect_headings(self.children, headings)
+        return headings
+
+    def to_data(self):
+        return [c.to_data() for c in self.children]
+
+    @classmethod
+    def from_data(cls, data):
+        return cls([_node_from_data(d) for d in data])
+
+
+def heading_text(html):
+    """Plain text of a heading's inline HTML."""
+    return _TAG_RE.sub("", html).strip()
+
+
+def _collect_headings(nodes, headings):
+    for node in nodes:
+        cls = node.__class__
+        if cls is Section:
+            if node.id:
+                headings.append({"level": 2, "text": heading_text(node.html), "id": node.id})
+            _collect_headings(node.children, headings)
+        elif cls is Heading:
+            if node.level == 3 and node.id:
+                headings.append({"level": 3, "text": heading_text(node.html), "id": node.id})
+        elif cls is Component:
+            _collect_headings(node.children, headings)
+
+
+def _node_from_data(data):
+    kind = data[0]
+    if kind == "p":
+        return Paragraph(data[1])
+    if kind == "raw":
+        return Raw(data[1])
+    if kind == "heading":
+        return Heading(data[1], data[2], data[3])
+    if kind == "section":
+        return Section(data[1], data[2], [_node_from_data(d) for d in data[3]])
+    if kind == "component":
+        return Component(data[1], data[2], [_node_from_data(d) for d in data[3]], data[4])
+    raise ValueError(f"unknown document node: {kind!r}")
@@ -0,0 +1,155 @@
+"""Build-time SVG icons for phosphor-docs.
+
+The nav, ::card{icon=...}, the pipeline arrows and the template mark icons
+as <i data-lucide="name"></i>. Instead of loading the Lucide library in the
+browser to replace them, the build swaps each one for
+<svg><use href="#icon-name"/></svg> and gives every page an inline sprite:
+one <symbol> per icon the page uses, read from the vendored icon set in
+theme/icons/ (Lucide, see icons.json there). Pages need no script and no
+network fetch to show their icons.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+
+
+_ICON_RE = re.compile(r'<i\b([^>]*?)\sdata-lucide="([^"]+)"([^>]*)>\s*</i>')
+_CLASS_RE = re.compile(r'\sclass="([^"]*)"')
+_SVG_RE = re.compile(r"<svg\b([^>]*)>(.*)</svg>", re.S)
+_VIEWBOX_RE = re.compile(r'\sviewBox="([^"]*)"')
+
+
+class IconSet:
+    """The icons in *directory*: one name.svg file per icon, plus
+    icons.json with the version of the set and old names (aliases).
+
+    Symbols and sprites are built on first use and cached. Instances are
+    pickled to build workers.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.aliases = {}
+        self.version = ""
+        try:
+            with open(os.path.join(directory, "icons.json")) as f:
+                meta = json.load(f)
+            self.aliases = meta.get("aliases", {})
+            self.version = meta.get("version", "")
+        except (OSError, ValueError):
+            pass
+        self._symbols = {}  # icon name -> <symbol> markup, or None if unknown
+        self._sprites = {}  # frozenset of icon names -> sprite markup
+        self._warned = set()
+
+    def fingerprint(self):
+        """Return a hash of the set for the build manifest: of icons.json
+        and the name and size of every icon file. That catches a new version
+        of the set, or an icon added, removed or redrawn, without reading
+        every file; use build --full after an edit that keeps the size."""
+        try:
+            entries = sorted(f"{e.name}:{e.stat().st_size}" for e in os.scandir(self.directory))
+        except OSError:
+            entries = []
+        return hashlib.sha256(json.dumps([self.version, self.aliases, entries]).encode("utf-8")).hexdigest()
+
+    def resolve(self, name):
+        """Return the file name (without .svg) of the icon *name*, or None."""
+        name = self.aliases.get(name, name)
+        if name not in self._symbols:
+            self._symbols[name] = self._load(name)
+        return name if self._symbols[name] is not None else None
+
+    def _load(self, name):
+        if not re.fullmatch(r"[a-z0-9-]+", name):
+            return None
+        try:
+            with open(os.path.join(self.directory, name + ".svg")) as f:
+                svg = f.read()
+        except OSError:
+            return None
+        m = _SVG_RE.search(svg)
+        if m is None:
+            return None
+        viewbox = _VIEWBOX_RE.search(m.group(1))
+        body = re.sub(r">\s+<", "><", m.group(2).strip()).replace(" />", "/>")
+        return f'<symbol id="icon-{name}" viewBox="{viewbox.group(1) if viewbox else "0 0 24 24"}">{body}</symbol>'
+
+    def replace(self, html, used):
+        """Return *html* with every <i data-lucide> icon as an inline
+        <svg><use>, adding the names of the icons to the set *used*.
+
+        Unknown icons are left as they are, with a warning.
+        """
+        if "data-lucide" not in html:
+            return html
+
+        def svg(m):
+            name = m.group(2)
+            icon = self.resolve(name)
+            if icon is None:
+                if name not in self._warned:
+                    self._warned.add(name)
+                    print(f"  Warning: unknown icon: {name}", file=sys.stderr)
+                return m.group(0)
+            used.add(icon)
+            attrs = m.group(1) + m.group(3)
+            classes = f"lucide lucide-{name}"
+            c = _CLASS_RE.search(attrs)
+            if c is not None:
+                classes += " " + c.group(1)
+                attrs = attrs[:c.start()] + attrs[c.end():]
+            # The attributes lucide.createIcons() gave its <svg>s, so the
+            # theme's CSS (stroke-width, sizes) still applies the same way
+            return (f'<svg class="{classes}"{attrs} width="24" height="24"'
+                    f' viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"'
+                    f' stroke-linecap="round" stroke-linejoin="round" aria-hidden="true">'
+                    f'<use href="#icon-{icon}"/></svg>')
+
+        return _ICON_RE.sub(svg, html)
+
+    def sprite(self, names):
+        """Return the hidden inline <svg> with a <symbol> for each of the
+        icon *names* (as added by replace()), or "" for none."""
+        if not names:
+            return ""
+        key = frozenset(names)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            symbols = "".join(self._symbols[name] for name in sorted(key))
+            sprite = f'<svg xmlns="http://www.w3.org/2000/svg" style="display:none">{symbols}</svg>'
+            self._sprites[key] = sprite
+        return sprite
+
+
+def icon_dir():
+    """Return the vendored icon set directory, theme/icons/."""
+    phosphor_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(phosphor_root, "theme", "icons")
+
+
+def inline_compiled(compiled, icon_set):
+    """Replace the icons in the static segments of a compiled template
+    (the template itself and every site-wide value, such as the nav).
+
+    Returns (compiled template, set of the icon names it uses).
+    """
+    used = set()
+    parts = list(compiled)
+    for i in range(0, len(parts), 2):
+        parts[i] = icon_set.replace(parts[i], used)
+    return tuple(parts), used
+
+
+def inline_page(icon_set, content, site_icons):
+    """Replace the icons in a page's *content*; *site_icons* are those of
+    its compiled template and nav.
+
+    Returns (content, the page's sprite).
+    """
+    used = set(site_icons)
+    content = icon_set.replace(content, used)
+    return content, icon_set.sprite(used)
@@ -0,0 +1,98 @@
+"""Build manifest for incremental phosphor-docs builds.
+
+Records a content hash of every build input (pages, docs.yaml, base template,
+theme files, Phosphor version) and of every output file in a .phosphor/
+directory next to _site/. The next build compares against the manifest to
+decide what to re-render and which outputs it can keep (see output.py);
+parsed pages are kept in the parse cache (see cache.py). The deploy manifest
+of the last build is saved next to it.
+"""
+
+import hashlib
+import json
+import os
+
+from . import __version__
+
+
+STATE_DIR = ".phosphor"
+MANIFEST_FILE = "manifest.json"
+DEPLOY_FILE = "deploy.json"
+
+
+def hash_text(text):
+    """Return the SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file, or "" if it doesn't exist."""
+    if not os.path.exists(path):
+        return ""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def state_dir(project_dir):
+    """Return the build state directory for a project."""
+    return os.path.join(project_dir, STATE_DIR)
+
+
+def new_manifest(output_dir):
+    """Return an empty manifest for a build into *output_dir*."""
+    return {
+        "version": __version__,
+        "output_dir": output_dir,
+        "inputs": {},
+        "pages": {},
+        "outputs": {},
+    }
+
+
+def load_manifest(project_dir, output_dir):
+    """Load the previous build manifest.
+
+    Returns None when there is no manifest, it can't be read, or it was
+    written by another Phosphor version or for another output directory —
+    in all of which cases the caller should do a full build.
+    """
+    path = os.path.join(state_dir(project_dir), MANIFEST_FILE)
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(manifest, dict):
+        return None
+    if manifest.get("version") != __version__:
+        return None
+    if manifest.get("output_dir") != output_dir:
+        return None
+    if not all(isinstance(manifest.get(key), dict) for key in ("inputs", "pages", "outputs")):
+        return None
+    return manifest
+
+
+def save_manifest(project_dir, manifest):
+    """Write the manifest atomically so an interrupted build can't corrupt it."""
+    _save(project_dir, MANIFEST_FILE, manifest)
+
+
+def save_deploy_manifest(project_dir, deploy):
+    """Write the deploy manifest of a build (see output.py); returns its path."""
+    return _save(project_dir, DEPLOY_FILE, deploy)
+
+
+def _save(project_dir, filename, data):
+    directory = state_dir(project_dir)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, filename)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,227 @@
+"""Staged build output for phosphor-docs.
+
+A build never writes into _site/ directly. Every output file is hashed, and
+only one whose content differs from the previous build is written, into a
+staging directory next to _site/; files that came out the same are left
+alone, so they keep their mtime and rsync and object storage syncs skip
+them. publish() then moves the staged files into _site/ with one atomic
+rename each, and commit() deletes the files the build no longer produces.
+A server reading _site/ meanwhile sees every file either old or new, never
+missing or half-written, and a build that fails before publishing leaves
+_site/ as it was.
+
+The result of each build is a deploy manifest: the hash of every file, and
+which files were added, changed or removed, so deploy tooling can upload
+just the delta.
+
+With --precompress, precompress() also stages compressed siblings of the
+text files (page.html.gz, and .br and .zst when the brotli and zstd modules
+are available) for static hosts, and phosphor serve, to send as they are.
+A sibling is only compressed again when its file changed.
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+
+from . import manifest as manifest_mod
+
+
+def hash_tree(directory):
+    """Return {relative path: SHA-256} for every file under *directory*."""
+    hashes = {}
+    for root, _, files in os.walk(directory):
+        for fname in files:
+            path = os.path.join(root, fname)
+            rel = os.path.relpath(path, directory).replace(os.sep, "/")
+            hashes[rel] = manifest_mod.hash_file(path)
+    return hashes
+
+
+# Text outputs worth precompressing, and the size below which they aren't
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".xml", ".txt")
+MIN_COMPRESS_SIZE = 512
+
+
+def _gzip(data):
+    # mtime=0 keeps the output, and so its hash, the same for the same input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compressors():
+    """Return [(sibling suffix, compress function)] for every encoding that
+    can be used here: gzip always, brotli and zstd if their modules are
+    installed (zstd is in the standard library from Python 3.14)."""
+    found = []
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        found.append((".br", lambda data: brotli.compress(data, quality=11)))
+    try:
+        from compression import zstd
+    except ImportError:
+        try:
+            import zstandard
+        except ImportError:
+            pass
+        else:
+            # A ZstdCompressor must not be shared between threads
+            found.append((".zst", lambda data: zstandard.ZstdCompressor(level=19).compress(data)))
+    else:
+        found.append((".zst", lambda data: zstd.compress(data, level=19)))
+    found.append((".gz", _gzip))
+    return found
+
+
+def staging_dir(output_dir):
+    """Return the staging directory for *output_dir*: a hidden sibling, so it
+    is on the same file system and files can be renamed into place."""
+    parent, name = os.path.split(output_dir)
+    return os.path.join(parent, f".{name}.staging")
+
+
+class SiteOutput:
+    """The files of a build into *output_dir*, staged until published.
+
+    *previous* maps each file of the current site to its hash. Instances
+    are pickled to build workers, which stage pages with put(); the main
+    process records them with add_page() and publishes them.
+    """
+
+    def __init__(self, output_dir, previous):
+        self.output_dir = output_dir
+        self.staging_dir = staging_dir(output_dir)
+        self.previous = previous
+        self.files = {}    # relative path -> hash, of every output file
+        self.written = {}  # the new or changed files, in the order staged
+        self._published = set()
+        self._compressed = set()
+
+    def start(self):
+        """Create an empty staging directory, clearing any left by an
+        interrupted build."""
+        if os.path.lexists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+        os.makedirs(os.path.join(self.staging_dir, "assets"))
+
+    def path(self, rel):
+        """Return the staging path of the site file *rel*."""
+        return os.path.join(self.staging_dir, rel)
+
+    def put(self, rel, data):
+        """Stage *data* (bytes) as the file *rel*, unless the current site
+        already has it; returns True if it was written."""
+        digest = hashlib.sha256(data).hexdigest()
+        self.files[rel] = digest
+        if self.previous.get(rel) == digest and self._exists(rel):
+            return False
+        with open(self.path(rel), "wb") as f:
+            f.write(data)
+        self.written[rel] = None
+        return True
+
+    def copy(self, rel, src, digest):
+        """Stage a copy of the file *src*, whose hash is *digest*, as *rel*,
+        unless the current site already has it; returns True if it was."""
+        self.files[rel] = digest
+        if self.previous.get(rel) == digest and self._exists(rel):
+            return False
+        shutil.copy2(src, self.path(rel))
+        self.written[rel] = None
+        return True
+
+    def keep(self, rel):
+        """Keep the current site's file *rel* as it is.
+
+        Returns False if there is no such file, in which case the caller has
+        to produce it.
+        """
+        if rel not in self.previous or not self._exists(rel):
+            return False
+        self.files[rel] = self.previous[rel]
+        return True
+
+    def _exists(self, rel):
+        return os.path.isfile(os.path.join(self.output_dir, rel))
+
+    def add_page(self, rel, digest, written):
+        """Record a page staged by a build worker."""
+        self.files[rel] = digest
+        if written:
+            self.written[rel] = None
+
+    def precompress(self, encoders, jobs=1):
+        """Stage the compressed siblings of the text files produced so far.
+
+        *encoders* is compressors() or a subset. A file that is unchanged
+        keeps the siblings it has; the others are compressed, over *jobs*
+        threads (zlib and the other compressors release the GIL). Returns
+        the siblings that were written.
+        """
+        tasks = []
+        for rel in list(self.files):
+            if rel in self._compressed or not rel.endswith(COMPRESSIBLE):
+                continue
+            self._compressed.add(rel)
+            unchanged = rel not in self.written
+            needed = [(suffix, func) for suffix, func in encoders if not (unchanged and self.keep(rel + suffix))]
+            if needed:
+                staged = self.path(rel) if rel in self.written else os.path.join(self.output_dir, rel)
+                tasks.append((rel, staged, needed))
+
+        def compress(task):
+            rel, path, needed = task
+            if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+                return []
+            with open(path, "rb") as f:
+                data = f.read()
+            return [(rel + suffix, func(data)) for suffix, func in needed]
+
+        if jobs > 1 and len(tasks) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(compress, tasks))
+        else:
+            results = [compress(task) for task in tasks]
+        written = []
+        for siblings in results:
+            for rel, data in siblings:
+                if self.put(rel, data):
+                    written.append(rel)
+        return written
+
+    def publish(self):
+        """Move the files staged so far into the site, each with an atomic
+        rename, in the order they were staged."""
+        for rel in self.written:
+            if rel not in self._published:
+                dest = os.path.join(self.output_dir, rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(self.path(rel), dest)
+                self._published.add(rel)
+
+    def commit(self):
+        """Publish what is left, delete the files of the previous build that
+        this one didn't produce, and return the deploy manifest."""
+        self.publish()
+        root = os.path.realpath(self.output_dir) + os.sep
+        removed = {}
+        for rel, digest in self.previous.items():
+            if rel in self.files:
+                continue
+            path = os.path.join(self.output_dir, rel)
+            if os.path.realpath(path).startswith(root) and os.path.isfile(path):
+                os.remove(path)
+            removed[rel] = digest
+        shutil.rmtree(self.staging_dir)
+        return {
+            "output_dir": self.output_dir,
+            "files": self.files,
+            "added": {rel: self.files[rel] for rel in self.written if rel not in self.previous},
+            "changed": {rel: self.files[rel] for rel in self.written if rel in self.previous},
+            "removed": removed,
+        }
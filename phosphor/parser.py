@@ -7,29 +7,57 @@ Also handles ```terminal blocks and {.class} attribute syntax.
 
 import re
 import sys
+import time
 import html as html_mod
 
+from .document import Component, Document, Heading, Paragraph, Raw, Section
+
+
+# ── Precompiled Patterns ──
+# Compiled once at import and shared (read-only) by every Parser and thread.
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+_JS_URL_RE = re.compile(r"^\s*javascript\s*:", re.IGNORECASE)
+
+# A link whose label holds no code span, image or nested link is matched
+# whole; anything else only marks where a construct may start.
+_INLINE_START_RE = re.compile(r"\[([^\]\[`]+)\]\(([^)]+)\)(?:\{\.(\w+)\})?|[`!\[]")
+_CODE2_RE = re.compile(r"``(.+?)``")
+_CODE1_RE = re.compile(r"`([^`]+)`")
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(([^)]+)\)")
+_LINK_TAIL_RE = re.compile(r"\(([^)]+)\)(?:\{\.(\w+)\})?")
+_LABEL_SCAN_RE = re.compile(r"``.+?``|`[^`]+`|!\[[^\]]*\]\([^)]+\)|\]")
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC_RE = re.compile(r"\*(.+?)\*")
+
+_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+_HERO_BUTTON_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)\{\.(\w+)\}')
+_CARD_RE = re.compile(r'::card\{([^}]*)\}\s*\n(.*?)(?=::card|\Z)', re.DOTALL)
+_FLAG_RE = re.compile(r'::flag\{([^}]*)\}\s*\n(.*?)(?=::flag|\Z)', re.DOTALL)
+_TABLE_SEP_LINE_RE = re.compile(r"^\|?\s*[-:]+")
+_PIPELINE_SPLIT_RE = re.compile(r"\s*->\s*")
+
+_FENCE_RE = re.compile(r"^(`{3,})(\w*)")
+_HR_RE = re.compile(r"^---+\s*$")
+_UL_RE = re.compile(r"^[\-\*]\s")
+_UL_MARKER_RE = re.compile(r"^[\-\*]\s+")
+_OL_RE = re.compile(r"^\d+\.\s")
+_OL_MARKER_RE = re.compile(r"^\d+\.\s+")
+_TABLE_SEP_RE = re.compile(r"^\|?\s*[-:|]+")
+_HTML_BLOCK_RE = re.compile(r"^</?(?:div|details|summary|table|thead|tbody|tr|th|td|section|nav|aside|header|footer|article|button|pre|ul|ol|hr|h[1-6]|a\s+class=\"hero)\b")
+# A line that ends a paragraph: blank, heading, fence, block HTML, list item or rule
+_PARA_BREAK_RE = re.compile(r"\s*$|#|```|\s*(?:<(?:div|details|table|section)\b|[\-\*]\s+\S|\d+\.\s+\S)|---+\s*$")
+_COMPONENT_OPEN_RE = re.compile(r"^:::([a-z][a-z0-9-]*)\s*(\{[^}]*\})?\s*(.*)$")
+_COMPONENT_NESTED_RE = re.compile(r"^:::[a-z][a-z0-9-]*")
+
 
 def slugify(text):
     """Convert text to a URL-friendly slug."""
     text = text.lower().strip()
-    text = re.sub(r"[^a-z0-9]+", "-", text)
+    text = _SLUG_RE.sub("-", text)
     return text.strip("-")
 
 
-# Per-page tracker for heading IDs — ensures uniqueness when headings share text
-_used_ids = {}
-
-
-def _unique_id(base_id):
-    """Return a unique ID, appending -2, -3, etc. for duplicates."""
-    if base_id not in _used_ids:
-        _used_ids[base_id] = 1
-        return base_id
-    _used_ids[base_id] += 1
-    return f"{base_id}-{_used_ids[base_id]}"
-
-
 def _escape(text):
     """HTML-escape text."""
     return html_mod.escape(text)
@@ -38,62 +66,218 @@ def _escape(text):
 def _escape_url(url):
     """Escape a URL for use in HTML attributes; reject javascript: URIs."""
     url = url.strip()
-    if re.match(r"^\s*javascript\s*:", url, re.IGNORECASE):
+    if _JS_URL_RE.match(url):
         return "#"
     return html_mod.escape(url, quote=True)
 
 
+# ── Parser State ──
+
+class ParseContext:
+    """Per-document parse state.
+
+    Owns the heading ID table, so every document — and every thread parsing
+    one — gets unique IDs independently of any other parse in progress.
+    With *timings* (a dict), the time spent in each ::: component parser is
+    added to it as {type: [count, seconds]}.
+    """
+
+    __slots__ = ("parser", "used_ids", "timings")
+
+    def __init__(self, parser, timings=None):
+        self.parser = parser
+        self.used_ids = {}
+        self.timings = timings
+
+    def unique_id(self, base_id):
+        """Return a unique ID, appending -2, -3, etc. for duplicates."""
+        if base_id not in self.used_ids:
+            self.used_ids[base_id] = 1
+            return base_id
+        self.used_ids[base_id] += 1
+        return f"{base_id}-{self.used_ids[base_id]}"
+
+    def warn(self, message):
+        """Report a recoverable problem in the document."""
+        if self.parser.warn:
+            print(f"  Warning: {message}", file=sys.stderr)
+
+
+class Parser:
+    """Configured extended-Markdown parser.
+
+    A Parser holds only options, never per-document state, so one instance
+    can be created up front and shared by any number of threads; each call
+    to parse() runs in its own ParseContext.
+
+    Args:
+        warn: Print warnings (e.g. unclosed ::: blocks) to stderr
+    """
+
+    def __init__(self, warn=True):
+        self.warn = warn
+
+    def parse(self, text):
+        """Parse extended Markdown into HTML.
+
+        Returns (html_content, headings) where headings is a list of
+        {"level": 2|3, "text": str, "id": str} for TOC generation.
+        """
+        document = self.parse_document(text)
+        return document.to_html(), document.headings()
+
+    def parse_document(self, text, timings=None):
+        """Parse extended Markdown into a document.Document tree.
+
+        *timings*, if given, collects per-component parse times (see
+        ParseContext).
+        """
+        ctx = ParseContext(self, timings)
+
+        # First pass: render ::: fenced blocks in place
+        lines = _process_fenced_blocks(text.split("\n"), ctx)
+
+        # Second pass: process remaining standard markdown
+        return Document(_process_block_content(lines, ctx))
+
+
 # ── Inline Markdown ──
 
+# Kinds of piece in the token stream built by _inline()
+_TEXT, _MARKUP = 0, 1
+
+
 def _inline(text):
     """Process inline Markdown: bold, italic, code, links, images.
 
-    Code spans are extracted first and replaced with placeholders so their
-    content is HTML-escaped and protected from further inline processing.
+    One left-to-right scan splits the text into source-text pieces and
+    generated HTML pieces (code spans, images, link tags). Code span content
+    is HTML-escaped and never processed further; link labels stay in the
+    stream so emphasis can span them. Emphasis is then resolved over the
+    "*" characters left in the text pieces (see _emphasis()).
     """
-    # Step 1: Extract inline code spans (double-backtick first, then single)
-    code_spans = []
+    if "`" not in text and "[" not in text:
+        # No code span, link or image to tokenize; only emphasis can apply
+        return _emphasis([text], [_TEXT]) if "*" in text else text
+    m = _INLINE_START_RE.search(text)
+
+    parts = []
+    kinds = []
+    links = []  # open links: (label_end, resume_at, closing_html), innermost last
+    pos = 0     # start of source text not yet copied to parts
+    limit = len(text)
+    code2_starts = None  # where the `` code spans start, found when needed
+
+    while True:
+        if m is None:
+            if not links:
+                break
+            # End of a link label: close the tag and skip past "](url){.class}"
+            label_end, resume_at, closing_html = links.pop()
+            parts += (text[pos:label_end], closing_html)
+            kinds += (_TEXT, _MARKUP)
+            pos = resume_at
+            limit = links[-1][0] if links else len(text)
+            m = _INLINE_START_RE.search(text, pos, limit)
+            continue
+
+        i = m.start()
+        ch = text[i]
+        end = 0
+
+        if m.lastindex:
+            # Plain link: the label is source text, so no need to scan it again
+            url, cls = _escape_url(m.group(2)), m.group(3)
+            opening = f'<a href="{url}" class="hero-btn {cls}">' if cls else f'<a href="{url}">'
+            parts += (text[pos:i], opening, m.group(1), "</a>")
+            kinds += (_TEXT, _MARKUP, _TEXT, _MARKUP)
+            end = m.end()
+
+        elif ch == "`":
+            # Inline code: `` content `` (may contain single backticks) or `content`
+            cm = _CODE2_RE.match(text, i, limit)
+            if cm is None:
+                cm = _CODE1_RE.match(text, i, limit)
+                # `` spans are found first, so a `span` can't end on one
+                if cm is not None:
+                    if code2_starts is None:
+                        code2_starts = {m2.start() for m2 in _CODE2_RE.finditer(text)} if "``" in text else ()
+                    if cm.end() - 1 in code2_starts:
+                        cm = None
+            if cm:
+                parts += (text[pos:i], f"<code>{_escape(cm.group(1).strip())}</code>")
+                kinds += (_TEXT, _MARKUP)
+                end = cm.end()
+
+        elif ch == "!":
+            # Image: ![alt](src)
+            im = _IMAGE_RE.match(text, i, limit)
+            if im:
+                alt, src = _escape(im.group(1)), _escape_url(im.group(2))
+                parts += (text[pos:i], f'<img src="{src}" alt="{alt}">')
+                kinds += (_TEXT, _MARKUP)
+                end = im.end()
+
+        else:
+            # Link: [text](url) or [text](url){.class}
+            close = _find_label_end(text, i + 1, limit)
+            lm = _LINK_TAIL_RE.match(text, close + 1, limit) if close > i + 1 else None
+            if lm:
+                url, cls = _escape_url(lm.group(1)), lm.group(2)
+                opening = f'<a href="{url}" class="hero-btn {cls}">' if cls else f'<a href="{url}">'
+                parts += (text[pos:i], opening)
+                kinds += (_TEXT, _MARKUP)
+                links.append((close, lm.end(), "</a>"))
+                limit = close
+                end = i + 1
+
+        if end:
+            pos = end
+        else:
+            end = i + 1  # not a construct after all — keep the character as text
+        m = _INLINE_START_RE.search(text, end, limit)
 
-    def _save_code(m):
-        idx = len(code_spans)
-        code_spans.append(f"<code>{_escape(m.group(1).strip())}</code>")
-        return f"\x00CODE{idx}\x00"
+    parts.append(text[pos:])
+    kinds.append(_TEXT)
+    return _emphasis(parts, kinds) if "*" in text else "".join(parts)
 
-    # Double-backtick inline code: `` content `` (may contain single backticks)
-    text = re.sub(r"``(.+?)``", _save_code, text)
-    # Single-backtick inline code: `content`
-    text = re.sub(r"`([^`]+)`", _save_code, text)
 
-    # Step 2: Process other inline elements on the remaining text
-    # Images: ![alt](src)
-    def _img_replace(m):
-        alt, src = _escape(m.group(1)), _escape_url(m.group(2))
-        return f'<img src="{src}" alt="{alt}">'
-    text = re.sub(r"!\[([^\]]*)\]\(([^)]+)\)", _img_replace, text)
+def _find_label_end(text, start, limit):
+    """Return the index of the "]" closing a link label that starts at *start*.
 
-    # Links with class: [text](url){.class}
-    def _link_class(m):
-        label, url, cls = m.group(1), _escape_url(m.group(2)), m.group(3)
-        return f'<a href="{url}" class="hero-btn {cls}">{label}</a>'
-    text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)\{\.(\w+)\}', _link_class, text)
+    Code spans and images inside the label are skipped, so a "]" inside
+    them does not end it. Returns -1 if the label is not closed before *limit*.
+    """
+    for m in _LABEL_SCAN_RE.finditer(text, start, limit):
+        if m.group() == "]":
+            return m.start()
+    return -1
 
-    # Regular links: [text](url)
-    def _link_replace(m):
-        label, url = m.group(1), _escape_url(m.group(2))
-        return f'<a href="{url}">{label}</a>'
-    text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", _link_replace, text)
 
-    # Bold
-    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+def _emphasis(parts, kinds):
+    """Turn ** and * pairs in the text pieces into <strong> and <em>, then join.
 
-    # Italic
-    text = re.sub(r"\*(.+?)\*", r"<em>\1</em>", text)
+    Each generated HTML piece stands in as a single NUL character while the
+    pairs are matched, so delimiters are only found in source text but
+    emphasis can still span a code span or link. Bold pairs are matched
+    first, then italic pairs among the remaining stars; neither crosses a
+    line break.
+    """
+    markup = [part for part, kind in zip(parts, kinds) if kind != _TEXT]
+    if not markup:
+        text = "".join(parts)
+        text = _BOLD_RE.sub(r"<strong>\1</strong>", text)
+        return _ITALIC_RE.sub(r"<em>\1</em>", text)
 
-    # Step 3: Restore code spans
-    for i, code_html in enumerate(code_spans):
-        text = text.replace(f"\x00CODE{i}\x00", code_html)
+    text = "".join(part if kind == _TEXT else "\x00" for part, kind in zip(parts, kinds))
+    text = _BOLD_RE.sub(r"<strong>\1</strong>", text)
+    text = _ITALIC_RE.sub(r"<em>\1</em>", text)
 
-    return text
+    chunks = text.split("\x00")
+    out = [chunks[0]]
+    for html, chunk in zip(markup, chunks[1:]):
+        out += (html, chunk)
+    return "".join(out)
 
 
 # ── Terminal Block ──
@@ -130,7 +314,7 @@ def _parse_attrs(attr_str):
     attrs = {}
     if not attr_str:
         return attrs
-    for m in re.finditer(r'([\w-]+)="([^"]*)"', attr_str):
+    for m in _ATTR_RE.finditer(attr_str):
         attrs[m.group(1)] = m.group(2)
     return attrs
 
@@ -148,11 +332,11 @@ def _parse_hero(content, attrs):
         if line.startswith("# "):
             title_text = line[2:]
             # Convert **text** to <span class="accent">text</span>
-            title_text = re.sub(r"\*\*(.+?)\*\*", r'<span class="accent">\1</span>', title_text)
+            title_text = _BOLD_RE.sub(r'<span class="accent">\1</span>', title_text)
             title_html = title_text
         elif line.startswith("["):
             # Button link: [Label](url){.class}
-            m = re.match(r'\[([^\]]+)\]\(([^)]+)\)\{\.(\w+)\}', line)
+            m = _HERO_BUTTON_RE.match(line)
             if m:
                 label, url, cls = m.group(1), _escape_url(m.group(2)), m.group(3)
                 buttons_html += f'          <a href="{url}" class="hero-btn {cls}">{label}</a>\n'
@@ -171,27 +355,27 @@ def _parse_hero(content, attrs):
     )
 
 
-def _parse_callout(content, attrs, callout_type):
-    """Parse callout block (tip/info/warn) into HTML."""
+def _parse_callout(content, attrs, callout_type, ctx):
+    """Parse callout block (tip/info/warn) into a Component node."""
     lines = content.strip().split("\n")
     title = lines[0].strip() if lines else callout_type.title()
     body = "\n".join(lines[1:]).strip() if len(lines) > 1 else ""
-    body_html = _process_block_content(body) if body else ""
+    children = _process_block_content(body.split("\n"), ctx) if body else []
 
-    return (
+    return Component(
+        callout_type,
         f'<div class="callout {callout_type}">\n'
         f'  <div class="callout-title">{_escape(title)}</div>\n'
-        f'  <div class="callout-body">{body_html}</div>\n'
-        f'</div>\n'
+        f'  <div class="callout-body">',
+        children,
+        '</div>\n'
+        '</div>\n',
     )
 
 
 def _parse_cards(content):
     """Parse cards container with ::card children."""
-    cards = re.findall(
-        r'::card\{([^}]*)\}\s*\n(.*?)(?=::card|\Z)',
-        content, re.DOTALL
-    )
+    cards = _CARD_RE.findall(content)
     cards_html = ""
     for attr_str, body in cards:
         attrs = _parse_attrs(attr_str)
@@ -223,7 +407,7 @@ def _parse_decision_grid(content):
     header_cells = [c.strip() for c in lines[0].strip("|").split("|")]
 
     # Skip separator line
-    data_lines = [ln for ln in lines[1:] if not re.match(r"^\|?\s*[-:]+", ln)]
+    data_lines = [ln for ln in lines[1:] if not _TABLE_SEP_LINE_RE.match(ln)]
 
     header_html = "".join(f'<div class="dg-header">{_escape(c)}</div>' for c in header_cells)
 
@@ -245,10 +429,7 @@ def _parse_command(content, attrs):
     title = attrs.get("title", "command")
     usage = attrs.get("usage", title)
 
-    flags = re.findall(
-        r'::flag\{([^}]*)\}\s*\n(.*?)(?=::flag|\Z)',
-        content, re.DOTALL
-    )
+    flags = _FLAG_RE.findall(content)
 
     flags_html = ""
     for attr_str, body in flags:
@@ -287,23 +468,26 @@ def _parse_command(content, attrs):
     )
 
 
-def _parse_accordion(content, attrs):
-    """Parse accordion block into details/summary HTML."""
+def _parse_accordion(content, attrs, ctx):
+    """Parse accordion block into a details/summary Component node."""
     title = attrs.get("title", "Details")
-    body_html = _process_block_content(content.strip())
+    children = _process_block_content(content.strip().split("\n"), ctx)
 
-    return (
+    return Component(
+        "accordion",
         f'<details class="trouble-item">\n'
         f'  <summary class="trouble-summary">{_escape(title)}</summary>\n'
-        f'  <div class="trouble-body">\n{body_html}\n  </div>\n'
-        f'</details>\n'
+        f'  <div class="trouble-body">\n',
+        children,
+        '  </div>\n'
+        '</details>\n',
     )
 
 
 def _parse_pipeline(content):
     """Parse pipeline block: Stage1 -> Stage2 -> Stage3."""
     text = content.strip()
-    stages = [s.strip() for s in re.split(r"\s*->\s*", text) if s.strip()]
+    stages = [s.strip() for s in _PIPELINE_SPLIT_RE.split(text) if s.strip()]
 
     html = '<div class="pipeline-flow">\n'
     for i, stage in enumerate(stages):
@@ -328,161 +512,149 @@ def _parse_pipeline(content):
 
 # ── Block-level Processing ──
 
-def _process_block_content(text):
-    """Process a chunk of text that may contain paragraphs, lists, code blocks, etc."""
-    lines = text.split("\n")
-    result = []
+
+def _process_block_content(lines, ctx):
+    """Process a list of lines that may contain paragraphs, lists, code blocks, etc.
+
+    Returns the list of document nodes. A single pass over the buffer: every
+    construct advances the index past the lines it consumes, and a ## heading
+    starts a new Section that collects the nodes up to the next one.
+    Component entries (from _process_fenced_blocks()) are kept as they are.
+    """
+    nodes = []
+    result = nodes  # where nodes go: the document, or the open section
+    n = len(lines)
     i = 0
+    in_section = False
 
-    while i < len(lines):
+    while i < n:
         line = lines[i]
 
+        # Rendered component
+        if line.__class__ is Component:
+            result.append(line)
+            i += 1
+            continue
+
+        stripped = line.strip()
+
         # Blank line
-        if not line.strip():
+        if not stripped:
             i += 1
             continue
 
         # Code block (``` fenced) — supports variable fence lengths (```, ````, etc.)
-        fence_match = re.match(r"^(`{3,})(\w*)", line.strip())
+        fence_match = _FENCE_RE.match(stripped) if stripped[0] == "`" else None
         if fence_match:
             fence = fence_match.group(1)  # e.g., ``` or ````
             lang = fence_match.group(2)
             code_lines = []
             i += 1
-            while i < len(lines):
-                stripped = lines[i].strip()
+            while i < n:
+                cur = lines[i]
+                if cur.__class__ is Component:
+                    # Pass 1 saw no fence here; keep the component's HTML as code text
+                    cur = cur.to_html()
+                stripped = cur.strip()
                 # Closing fence must be exactly the same length (or longer)
                 if stripped == fence or (stripped.startswith(fence) and not stripped[len(fence):].strip()):
                     break
-                code_lines.append(lines[i])
+                code_lines.append(cur)
                 i += 1
             i += 1  # skip closing fence
 
             if lang == "terminal":
-                result.append(_parse_terminal(code_lines))
+                result.append(Raw(_parse_terminal(code_lines)))
             else:
                 code_content = _escape("\n".join(code_lines))
-                result.append(f'<pre><code>{code_content}</code></pre>\n')
+                result.append(Raw(f'<pre><code>{code_content}</code></pre>\n'))
             continue
 
-        # Heading h2
-        if line.startswith("## "):
-            heading_text = line[3:].strip()
-            hid = _unique_id(slugify(heading_text))
-            result.append(
-                f'<div class="section" id="{hid}">\n'
-                f'  <span class="section-anchor"></span>\n'
-                f'  <h2>{_inline(heading_text)}</h2>\n'
-                f'  <hr class="section-rule">\n'
-            )
-            # Collect section content until next h2, respecting code fences
-            i += 1
-            section_lines = []
-            in_fence = False
-            fence_str = ""
-            while i < len(lines):
-                cur = lines[i]
-                stripped = cur.strip()
-                # Track code fence state
-                if not in_fence:
-                    fm = re.match(r"^(`{3,})", stripped)
-                    if fm:
-                        in_fence = True
-                        fence_str = fm.group(1)
-                else:
-                    if stripped == fence_str or (stripped.startswith(fence_str) and not stripped[len(fence_str):].strip()):
-                        in_fence = False
-                # Only break on h2 if not inside a code fence
-                if not in_fence and cur.startswith("## "):
-                    break
-                section_lines.append(cur)
+        if line[0] == "#":
+            # Heading h2 — closes the previous section and opens a new one
+            if line.startswith("## "):
+                heading_text = line[3:].strip()
+                section = Section(ctx.unique_id(slugify(heading_text)), _inline(heading_text))
+                nodes.append(section)
+                result = section.children
+                in_section = True
                 i += 1
-            section_content = _process_block_content("\n".join(section_lines))
-            result.append(section_content)
-            result.append("</div>\n")
-            continue
+                continue
 
-        # Heading h3
-        if line.startswith("### "):
-            heading_text = line[4:].strip()
-            hid = _unique_id(slugify(heading_text))
-            result.append(f'<h3 id="{hid}">{_inline(heading_text)}</h3>\n')
-            i += 1
-            continue
+            # Heading h3
+            if line.startswith("### "):
+                heading_text = line[4:].strip()
+                hid = ctx.unique_id(slugify(heading_text))
+                result.append(Heading(3, hid, _inline(heading_text)))
+                i += 1
+                continue
 
-        # Heading h4
-        if line.startswith("#### "):
-            heading_text = line[5:].strip()
-            result.append(f'<h4>{_inline(heading_text)}</h4>\n')
-            i += 1
-            continue
+            # Heading h4
+            if line.startswith("#### "):
+                heading_text = line[5:].strip()
+                result.append(Heading(4, None, _inline(heading_text)))
+                i += 1
+                continue
 
         # Horizontal rule
-        if re.match(r"^---+\s*$", line):
-            result.append("<hr>\n")
+        if _HR_RE.match(line):
+            result.append(Raw("<hr>\n"))
             i += 1
             continue
 
         # Unordered list
-        if re.match(r"^[\-\*]\s", line.strip()):
+        if _UL_RE.match(stripped):
             list_items = []
-            while i < len(lines) and re.match(r"^[\-\*]\s", lines[i].strip()):
-                item_text = re.sub(r"^[\-\*]\s+", "", lines[i].strip())
+            while i < n and lines[i].__class__ is not Component and _UL_RE.match(lines[i].strip()):
+                item_text = _UL_MARKER_RE.sub("", lines[i].strip())
                 list_items.append(f"  <li>{_inline(item_text)}</li>")
                 i += 1
-            result.append("<ul>\n" + "\n".join(list_items) + "\n</ul>\n")
+            result.append(Raw("<ul>\n" + "\n".join(list_items) + "\n</ul>\n"))
             continue
 
         # Ordered list
-        if re.match(r"^\d+\.\s", line.strip()):
+        if _OL_RE.match(stripped):
             list_items = []
-            while i < len(lines) and re.match(r"^\d+\.\s", lines[i].strip()):
-                item_text = re.sub(r"^\d+\.\s+", "", lines[i].strip())
+            while i < n and lines[i].__class__ is not Component and _OL_RE.match(lines[i].strip()):
+                item_text = _OL_MARKER_RE.sub("", lines[i].strip())
                 list_items.append(f"  <li>{_inline(item_text)}</li>")
                 i += 1
-            result.append("<ol>\n" + "\n".join(list_items) + "\n</ol>\n")
+            result.append(Raw("<ol>\n" + "\n".join(list_items) + "\n</ol>\n"))
             continue
 
-        # Table (markdown)
-        if "|" in line and i + 1 < len(lines) and re.match(r"^\|?\s*[-:|]+", lines[i + 1]):
+        # Table (markdown) — ends at the next ## heading when inside a section
+        if "|" in line and i + 1 < n and lines[i + 1].__class__ is not Component and _TABLE_SEP_RE.match(lines[i + 1]):
             table_lines = []
-            while i < len(lines) and "|" in lines[i]:
+            while (i < n and lines[i].__class__ is not Component and "|" in lines[i]
+                   and not (in_section and lines[i].startswith("## "))):
                 table_lines.append(lines[i])
                 i += 1
-            result.append(_parse_markdown_table(table_lines))
+            result.append(Raw(_parse_markdown_table(table_lines)))
             continue
 
         # HTML block — pass through lines starting with block-level HTML tags
         # (opening or closing, or self-closing elements)
-        stripped = line.strip()
-        _html_block_re = r"^</?(?:div|details|summary|table|thead|tbody|tr|th|td|section|nav|aside|header|footer|article|button|pre|ul|ol|hr|h[1-6]|a\s+class=\"hero)\b"
-        if re.match(_html_block_re, stripped):
-            # Collect consecutive HTML lines
-            block_lines = [line]
+        if _HTML_BLOCK_RE.match(stripped):
+            # Collect consecutive lines until a blank line, heading, fence or ::: line
+            start = i
             i += 1
-            while i < len(lines):
+            while i < n and lines[i].__class__ is not Component:
                 cur = lines[i].strip()
-                if not cur:
-                    i += 1
-                    break
-                # Continue if it looks like HTML or content within HTML
-                if re.match(_html_block_re, cur) or cur.startswith("</") or cur.startswith("<") or (block_lines and not cur.startswith("#") and not cur.startswith("```") and not re.match(r"^:::", cur)):
-                    block_lines.append(lines[i])
-                    i += 1
-                else:
+                if not cur or (cur[0] != "<" and (cur[0] == "#" or cur.startswith("```") or cur.startswith(":::"))):
                     break
-            result.append("\n".join(block_lines) + "\n")
+                i += 1
+            result.append(Raw("\n".join(lines[start:i]) + "\n"))
             continue
 
-        # Default: paragraph
-        para_lines = []
-        while i < len(lines) and lines[i].strip() and not lines[i].startswith("#") and not lines[i].startswith("```") and not re.match(r"^<(?:div|details|table|section)\b", lines[i].strip()) and not re.match(r"^[\-\*]\s", lines[i].strip()) and not re.match(r"^\d+\.\s", lines[i].strip()) and not re.match(r"^---+\s*$", lines[i]):
-            para_lines.append(lines[i])
+        # Default: paragraph. The first line is always taken, so a line that
+        # merely starts with "#" (e.g. "# Title") becomes paragraph text.
+        start = i
+        i += 1
+        while i < n and lines[i].__class__ is not Component and not _PARA_BREAK_RE.match(lines[i]):
             i += 1
-        if para_lines:
-            result.append(f"<p>{_inline(' '.join(para_lines))}</p>\n")
+        result.append(Paragraph(_inline(" ".join(lines[start:i]))))
 
-    return "".join(result)
+    return nodes
 
 
 def _parse_markdown_table(lines):
@@ -515,59 +687,33 @@ def _parse_markdown_table(lines):
 
 # ── Main Parser ──
 
+_default_parser = Parser()
+
+
 def parse_markdown(text):
-    """Parse extended Markdown into HTML.
+    """Parse extended Markdown into HTML with the default Parser.
 
     Returns (html_content, headings) where headings is a list of
     {"level": 2|3, "text": str, "id": str} for TOC generation.
     """
-    # Reset the per-page ID counter so duplicate headings get unique suffixes
-    _used_ids.clear()
-
-    # First pass: extract and process ::: fenced blocks
-    text = _process_fenced_blocks(text)
-
-    # Second pass: process remaining standard markdown
-    html = _process_block_content(text)
-
-    # Extract headings for TOC
-    headings = []
-    for m in re.finditer(r'<(?:div class="section" id|h3 id)="([^"]+)"[^>]*>\s*(?:<[^>]+>\s*){0,5}(?:<h[23][^>]*>)?(.*?)</h[23]>', html):
-        tag_id = m.group(1)
-        # Determine level from context
-        if 'class="section"' in m.group(0):
-            level = 2
-        else:
-            level = 3
-        text_content = re.sub(r"<[^>]+>", "", m.group(2)).strip()
-        headings.append({"level": level, "text": text_content, "id": tag_id})
-
-    # Also find h2 headings inside sections
-    for m in re.finditer(r'<div class="section" id="([^"]+)"[^>]*>.*?<h2>(.*?)</h2>', html, re.DOTALL):
-        tag_id = m.group(1)
-        text_content = re.sub(r"<[^>]+>", "", m.group(2)).strip()
-        # Check if already captured
-        if not any(h["id"] == tag_id for h in headings):
-            headings.append({"level": 2, "text": text_content, "id": tag_id})
+    return _default_parser.parse(text)
 
-    # Find h3 headings
-    for m in re.finditer(r'<h3 id="([^"]+)">(.*?)</h3>', html):
-        tag_id = m.group(1)
-        text_content = re.sub(r"<[^>]+>", "", m.group(2)).strip()
-        if not any(h["id"] == tag_id for h in headings):
-            headings.append({"level": 3, "text": text_content, "id": tag_id})
 
-    return html, headings
+def parse_document(text, timings=None):
+    """Parse extended Markdown into a document.Document with the default Parser."""
+    return _default_parser.parse_document(text, timings)
 
 
-def _process_fenced_blocks(text):
+def _process_fenced_blocks(lines, ctx):
     """Process ::: fenced blocks and replace them with HTML.
 
+    Returns the line buffer for _process_block_content(): source lines,
+    with each rendered component as a single document.Component entry.
+
     Tracks code fence state so that ```::: ``` inside a code fence is not
     treated as a component delimiter.  Warns on unclosed ::: blocks.
     """
     result = []
-    lines = text.split("\n")
     i = 0
 
     while i < len(lines):
@@ -575,7 +721,7 @@ def _process_fenced_blocks(text):
         stripped = line.strip()
 
         # Skip over code fences — pass lines through until fence closes
-        fence_match = re.match(r"^(`{3,})", stripped)
+        fence_match = _FENCE_RE.match(stripped)
         if fence_match:
             fence_str = fence_match.group(1)
             result.append(line)
@@ -589,7 +735,7 @@ def _process_fenced_blocks(text):
             continue
 
         # Check for ::: block start (supports hyphenated types like decision-grid)
-        m = re.match(r"^:::([a-z][a-z0-9-]*)\s*(\{[^}]*\})?\s*(.*)$", stripped)
+        m = _COMPONENT_OPEN_RE.match(stripped)
         if m:
             block_type = m.group(1)
             attr_str = m.group(2) or ""
@@ -608,7 +754,7 @@ def _process_fenced_blocks(text):
 
                 # Track code fence state inside ::: blocks
                 if not in_fence:
-                    fm = re.match(r"^(`{3,})", s)
+                    fm = _FENCE_RE.match(s)
                     if fm:
                         in_fence = True
                         code_fence_str = fm.group(1)
@@ -622,7 +768,7 @@ def _process_fenced_blocks(text):
                         depth -= 1
                         if depth == 0:
                             break
-                    elif re.match(r"^:::[a-z][a-z0-9-]*", s):
+                    elif _COMPONENT_NESTED_RE.match(s):
                         depth += 1
 
                 block_lines.append(lines[i])
@@ -630,34 +776,27 @@ def _process_fenced_blocks(text):
 
             if depth != 0:
                 # Unclosed block — warn and treat collected content as the block
-                print(
-                    f"  Warning: Unclosed :::{block_type} block (started near line {start_line}); "
-                    f"treating rest of file as block content",
-                    file=sys.stderr,
+                ctx.warn(
+                    f"Unclosed :::{block_type} block (started near line {start_line}); "
+                    f"treating rest of file as block content"
                 )
             else:
                 i += 1  # skip closing :::
 
             block_content = "\n".join(block_lines)
 
-            # Dispatch to component parser
-            if block_type in ("tip", "info", "warn"):
-                # If title was on the ::: line, prepend it to content
-                if inline_title:
-                    block_content = inline_title + "\n" + block_content
-                result.append(_parse_callout(block_content, attrs, block_type))
-            elif block_type == "cards":
-                result.append(_parse_cards(block_content))
-            elif block_type == "decision-grid":
-                result.append(_parse_decision_grid(block_content))
-            elif block_type == "command":
-                result.append(_parse_command(block_content, attrs))
-            elif block_type == "accordion":
-                result.append(_parse_accordion(block_content, attrs))
-            elif block_type == "pipeline":
-                result.append(_parse_pipeline(block_content))
-            elif block_type == "hero":
-                result.append(_parse_hero(block_content, attrs))
+            if ctx.timings is None:
+                component = _parse_component(block_type, block_content, inline_title, attrs, ctx)
+            else:
+                start = time.perf_counter()
+                component = _parse_component(block_type, block_content, inline_title, attrs, ctx)
+                if component is not None:
+                    timing = ctx.timings.setdefault(block_type, [0, 0.0])
+                    timing[0] += 1
+                    timing[1] += time.perf_counter() - start
+
+            if component is not None:
+                result.append(component)
             else:
                 # Unknown component type — pass through as-is
                 result.append(line)
@@ -666,4 +805,26 @@ def _process_fenced_blocks(text):
             result.append(line)
             i += 1
 
-    return "\n".join(result)
+    return result
+
+
+def _parse_component(block_type, content, inline_title, attrs, ctx):
+    """Dispatch a ::: block to its component parser; None for unknown types."""
+    if block_type in ("tip", "info", "warn"):
+        # If title was on the ::: line, prepend it to content
+        if inline_title:
+            content = inline_title + "\n" + content
+        return _parse_callout(content, attrs, block_type, ctx)
+    if block_type == "cards":
+        return Component(block_type, _parse_cards(content))
+    if block_type == "decision-grid":
+        return Component(block_type, _parse_decision_grid(content))
+    if block_type == "command":
+        return Component(block_type, _parse_command(content, attrs))
+    if block_type == "accordion":
+        return _parse_accordion(content, attrs, ctx)
+    if block_type == "pipeline":
+        return Component(block_type, _parse_pipeline(content))
+    if block_type == "hero":
+        return Component(block_type, _parse_hero(content, attrs))
+    return None
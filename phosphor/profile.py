@@ -0,0 +1,252 @@
+"""Build profiling for phosphor build --profile.
+
+A Profile records wall and CPU time for each phase of a build (config,
+manifest, assets, pages, compress, search, cleanup), and for every page the
+time spent reading, parsing (or loading the cached parse), rendering,
+indexing and writing it, along with the time per ::: component type and the
+bytes read and written. Pages may be built in worker processes: each one is
+timed there by a PageTimer and its record is sent back with the page's
+results.
+
+The report is printed as a short summary, slowest first, and saved as JSON
+so runs can be archived and diffed.
+"""
+
+import json
+import os
+import sys
+import time
+
+from . import __version__
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Page steps in the order they happen: read the source, load the cached
+# parse or parse and cache it, serialize the tree, index it, write the page
+PAGE_STEPS = ("read", "load", "parse", "cache", "render", "index", "write")
+
+
+class PageTimer:
+    """Time the steps of building one page, in whichever process builds it."""
+
+    def __init__(self):
+        self.components = {}  # filled in by the parser, see ParseContext
+        self._record = {"bytes_read": 0, "bytes_written": 0}
+        self._start = self._last = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def lap(self, step):
+        """Charge the time since the previous lap to *step*."""
+        now = time.perf_counter()
+        self._record[step] = self._record.get(step, 0.0) + now - self._last
+        self._last = now
+
+    def read(self, path):
+        self._record["bytes_read"] += _size(path)
+
+    def wrote(self, path):
+        self._record["bytes_written"] += _size(path)
+
+    def result(self):
+        """Return the page record: step times, wall, cpu, bytes, components."""
+        self._record["wall"] = time.perf_counter() - self._start
+        self._record["cpu"] = time.process_time() - self._cpu
+        self._record["components"] = self.components
+        return self._record
+
+
+class _NoTimer:
+    """Stand-in for PageTimer when the build isn't being profiled."""
+
+    components = None
+
+    def lap(self, step):
+        pass
+
+    def read(self, path):
+        pass
+
+    def wrote(self, path):
+        pass
+
+    def result(self):
+        return None
+
+
+NO_TIMER = _NoTimer()
+
+
+class Profile:
+    """Timings and I/O counters for one build."""
+
+    def __init__(self):
+        self.meta = {}
+        self.phases = {}      # phase -> [wall, cpu], in the order they ran
+        self.pages = []       # page records, in build order
+        self.components = {}  # ::: type -> [count, seconds]
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._phase = None
+        self._start = (time.perf_counter(), time.process_time())
+        self._workers_start = None  # children's CPU time when the pool started
+        self._total = None
+
+    def lap(self, phase):
+        """End the current phase and start *phase* (None: just end it)."""
+        now = (time.perf_counter(), time.process_time())
+        if self._phase is not None:
+            name, wall, cpu = self._phase
+            totals = self.phases.setdefault(name, [0.0, 0.0])
+            totals[0] += now[0] - wall
+            totals[1] += now[1] - cpu
+        self._phase = None if phase is None else (phase, *now)
+
+    def read(self, path):
+        self.bytes_read += _size(path)
+
+    def wrote(self, path):
+        self.bytes_written += _size(path)
+
+    def workers_started(self):
+        """Note that pages are going to worker processes. Only then are the
+        children's CPU time and memory reported, and only from here on: the
+        build runs other subprocesses too, such as git."""
+        if self._workers_start is None:
+            self._workers_start = _children_cpu()
+
+    def add_page(self, filename, record, read_time=0.0, read_bytes=0):
+        """Add a PageTimer record; *read_time* and *read_bytes* cover reading
+        the source, which happens in the main process."""
+        for kind, (count, seconds) in record.pop("components").items():
+            totals = self.components.setdefault(kind, [0, 0.0])
+            totals[0] += count
+            totals[1] += seconds
+        page = {"file": filename, "wall": record["wall"] + read_time, "cpu": record["cpu"], "read": read_time}
+        page.update((step, record[step]) for step in PAGE_STEPS if step in record)
+        page["bytes_read"] = record["bytes_read"] + read_bytes
+        page["bytes_written"] = record["bytes_written"]
+        self.bytes_read += page["bytes_read"]
+        self.bytes_written += page["bytes_written"]
+        self.pages.append(page)
+
+    def finish(self):
+        """Stop the clock; call once the build has returned."""
+        self.lap(None)
+        wall, cpu = self._start
+        self._total = (
+            time.perf_counter() - wall,
+            time.process_time() - cpu,
+            0.0 if self._workers_start is None else _children_cpu() - self._workers_start,
+        )
+
+    def report(self):
+        """Return the profile as a JSON-serializable dict."""
+        import platform
+
+        if self._total is None:
+            self.finish()
+        wall, cpu, workers_cpu = self._total
+        page_steps = {}
+        for page in self.pages:
+            for step in PAGE_STEPS:
+                if step in page:
+                    page_steps[step] = page_steps.get(step, 0.0) + page[step]
+        return {
+            "version": __version__,
+            "python": platform.python_version(),
+            "platform": sys.platform,
+            "cpus": os.cpu_count(),
+            **self.meta,
+            "total": {"wall": _round(wall), "cpu": _round(cpu), "workers_cpu": _round(workers_cpu)},
+            "phases": {name: {"wall": _round(w), "cpu": _round(c)} for name, (w, c) in self.phases.items()},
+            "page_steps": {step: _round(page_steps[step]) for step in PAGE_STEPS if step in page_steps},
+            "components": {
+                kind: {"count": count, "seconds": _round(seconds)}
+                for kind, (count, seconds) in sorted(self.components.items(), key=lambda kv: -kv[1][1])
+            },
+            "bytes": {"read": self.bytes_read, "written": self.bytes_written},
+            "peak_rss": {"main": _peak_rss(False), "workers": None if self._workers_start is None else _peak_rss(True)},
+            "pages": [
+                {key: _round(value) if isinstance(value, float) else value for key, value in page.items()}
+                for page in self.pages
+            ],
+        }
+
+    def save(self, path):
+        """Write the JSON report to *path*."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+
+    def summary(self, top=10):
+        """Return the console summary as a list of lines."""
+        report = self.report()
+        total = report["total"]
+        lines = ["", "Profile:", f"  {'phase':<12} {'wall':>10} {'cpu':>10}"]
+        for name, t in report["phases"].items():
+            lines.append(f"  {name:<12} {_ms(t['wall']):>10} {_ms(t['cpu']):>10}")
+        lines.append(f"  {'total':<12} {_ms(total['wall']):>10} {_ms(total['cpu']):>10}")
+        if total["workers_cpu"]:
+            lines.append(f"  {'(workers)':<12} {'':>10} {_ms(total['workers_cpu']):>10}")
+
+        if report["page_steps"]:
+            steps = ", ".join(f"{step} {_ms(s)}" for step, s in report["page_steps"].items())
+            lines += ["", f"  Page steps: {steps}"]
+
+        if self.pages:
+            lines += ["", f"  Slowest pages (of {len(self.pages)}):"]
+            for page in sorted(self.pages, key=lambda p: -p["wall"])[:top]:
+                steps = ", ".join(f"{step} {_ms(page[step])}" for step in PAGE_STEPS if step in page)
+                lines.append(f"    {page['file']:<32} {_ms(page['wall']):>10}  ({steps})")
+
+        if report["components"]:
+            lines += ["", "  Components:"]
+            for kind, c in report["components"].items():
+                lines.append(f"    {kind:<16} {c['count']:>6} x {_ms(c['seconds']):>10}")
+
+        peak = report["peak_rss"]
+        memory = "" if peak["main"] is None else f", peak memory {_mb(peak['main'])}"
+        if peak["workers"]:
+            memory += f" (workers {_mb(peak['workers'])})"
+        lines += ["", f"  Read {_mb(self.bytes_read)}, wrote {_mb(self.bytes_written)}{memory}"]
+        return lines
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _children_cpu():
+    """CPU seconds used by finished child processes."""
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+def _peak_rss(children):
+    """Peak resident memory in bytes, of this process or its largest child."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes, except on macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def _round(seconds):
+    return round(seconds, 6)
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f} ms"
+
+
+def _mb(nbytes):
+    return f"{nbytes / 1e6:.1f} MB"
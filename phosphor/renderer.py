@@ -1,13 +1,25 @@
 """Template renderer for phosphor-docs.
 
-Simple {{VAR}} substitution in base.html template.
+Simple {{VAR}} substitution in base.html template, compiled once per site,
+with references to assets/ rewritten to their fingerprinted file names.
 Builds sidebar nav HTML from config.
 """
 
+import hashlib
 import os
+import re
 import html as html_mod
 
 
+_SLOT_RE = re.compile(r"\{\{([A-Z_]+)\}\}")
+
+# Slots filled per page; every other slot has the same value on all pages
+_PAGE_SLOTS = ("CONTENT", "TOC", "ICONS")
+
+# An assets/ URL in an attribute value of the template
+_ASSET_REF_RE = re.compile(r"""(?<=["'])assets/([\w.-]+)(?=["'?#])""")
+
+
 def _escape(text):
     return html_mod.escape(text)
 
@@ -42,16 +54,54 @@ def build_nav_html(nav_config, current_page):
     return html
 
 
+def build_shared_nav(nav_config, icon_set=None, used=None):
+    """Split the sidebar nav for a site with site.shared_nav set.
+
+    Returns (file name, fragment, page navs, default nav). The fragment is
+    the full nav HTML, written once as assets/<file name>, which is named
+    after its content so it can be cached indefinitely. Page navs maps each
+    page's HTML file name to its sidebar markup: a placeholder that
+    script.js fills with the fragment, holding until then just the nav
+    group that links to the page. Pages that aren't in the nav get the
+    default, an empty placeholder.
+
+    With an *icon_set* (see icons.py) the nav icons are inlined, and the
+    names of all of them added to the set *used*: the fragment has no
+    sprite of its own, so every page needs their symbols.
+    """
+    def nav_html(groups):
+        html = build_nav_html(groups, "")
+        return html if icon_set is None else icon_set.replace(html, used)
+
+    fragment = nav_html(nav_config)
+    filename = f"nav.{hashlib.sha256(fragment.encode('utf-8')).hexdigest()[:12]}.html"
+    holder = f'<div class="nav-shared" data-nav-src="assets/{filename}">\n'
+    page_navs = {}
+    for group in nav_config:
+        group_html = None
+        for item in group.get("items", []):
+            page_html = item.get("page", "").replace(".md", ".html")
+            if page_html and page_html not in page_navs:
+                if group_html is None:
+                    group_html = holder + nav_html([group]) + "</div>\n"
+                page_navs[page_html] = group_html
+    return filename, fragment, page_navs, holder + "</div>\n"
+
+
 def build_toc_html(headings):
-    """Build table of contents HTML from heading list."""
+    """Build table of contents HTML from heading list.
+
+    *headings* is Document.headings(): an h2 links to its section, which
+    has the h2's id. Pages with fewer than two headings get no TOC.
+    """
     if len(headings) <= 1:
         return ""
 
     html = '<div class="toc-label">On this page</div>\n'
     for h in headings:
-        cls = "toc-h3" if h["level"] == 3 else ""
-        cls_attr = f' class="{cls}"' if cls else ""
-        html += f'<a href="#{h["id"]}"{cls_attr}>{_escape(h["text"])}</a>\n'
+        # The heading text still has the entities of its HTML
+        text = _escape(html_mod.unescape(h["text"]))
+        html += f'<a href="#{h["id"]}" class="toc-h{h["level"]}">{text}</a>\n'
 
     return html
 
@@ -99,16 +149,53 @@ def build_theme_css(theme_config):
     return f"<style>\n  :root {{\n{lines}\n  }}\n</style>"
 
 
-def render_page(template, config, page_content, nav_html, page_filename):
-    """Render a page by substituting variables into the template."""
-    site = config["site"]
+def asset_filename(name, digest):
+    """Return the fingerprinted file name of the asset *name* whose content
+    hashes to *digest*: style.css becomes style.<12 hex digits>.css."""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest[:12]}{ext}"
+
+
+def compile_template(template, config, nav_html, assets=None):
+    """Compile base.html for a site.
 
-    # Build the page title
-    page_title = site["title"]
+    Site-wide slots (title, theme CSS, favicon, nav, GitHub link, ...) are
+    filled in once; the result is a tuple of static text segments with one
+    per-page slot name between each pair: (text, slot, text, ..., text).
+    With nav_html=None the nav differs per page (see build_shared_nav())
+    and is a per-page slot too. Unknown {{VARS}} are left as they are.
+    *assets* maps asset names to fingerprinted file names (see
+    asset_filename()); assets/ references to them in the template, and the
+    favicon, point at those files.
+    """
+    if assets:
+        template = _ASSET_REF_RE.sub(lambda m: "assets/" + assets.get(m.group(1), m.group(1)), template)
+    values = _site_slots(config, nav_html, assets or {})
+    page_slots = _PAGE_SLOTS + ("NAV",) if nav_html is None else _PAGE_SLOTS
+    parts = [""]
+    pos = 0
+    for m in _SLOT_RE.finditer(template):
+        name = m.group(1)
+        if name in page_slots:
+            parts[-1] += template[pos:m.start()]
+            parts.extend((name, ""))
+        else:
+            parts[-1] += template[pos:m.start()] + values.get(name, m.group(0))
+        pos = m.end()
+    parts[-1] += template[pos:]
+    return tuple(parts)
 
-    # Favicon — file-based with cache-busting query param from theme accent
+
+def _site_slots(config, nav_html, assets):
+    """Values of the slots that are the same on every page."""
+    site = config["site"]
+
+    # Favicon — fingerprinted, or else file-based with cache-busting query
+    # param from theme accent
     custom_favicon = site.get("favicon", "")
-    if custom_favicon:
+    if "favicon.svg" in assets:
+        favicon = f"assets/{assets['favicon.svg']}"
+    elif custom_favicon:
         favicon = "assets/favicon.svg"
     else:
         theme = config.get("theme", {})
@@ -129,19 +216,48 @@ def render_page(template, config, page_content, nav_html, page_filename):
             f'</a>'
         )
 
-    # Theme overrides
-    theme_css = build_theme_css(config.get("theme", {}))
-
-    # Substitutions
-    output = template
-    output = output.replace("{{THEME_CSS}}", theme_css)
-    output = output.replace("{{TITLE}}", _escape(page_title))
-    output = output.replace("{{SITE_TITLE}}", _escape(site["title"]))
-    output = output.replace("{{TAGLINE}}", _escape(site.get("tagline", "")))
-    output = output.replace("{{LOGO_TEXT}}", _escape(site.get("logo_text", "PD")))
-    output = output.replace("{{FAVICON}}", favicon)
-    output = output.replace("{{NAV}}", nav_html)
-    output = output.replace("{{GITHUB_LINK}}", github_html)
-    output = output.replace("{{CONTENT}}", page_content)
-
-    return output
+    return {
+        "THEME_CSS": build_theme_css(config.get("theme", {})),
+        "TITLE": _escape(site["title"]),
+        "SITE_TITLE": _escape(site["title"]),
+        "TAGLINE": _escape(site.get("tagline", "")),
+        "LOGO_TEXT": _escape(site.get("logo_text", "PD")),
+        "FAVICON": favicon,
+        "NAV": nav_html,
+        "GITHUB_LINK": github_html,
+    }
+
+
+def _page_pieces(compiled, page_content, page_nav="", icons="", toc=""):
+    """The compiled template's segments with the page's slot values between them."""
+    values = {"CONTENT": page_content, "NAV": page_nav, "ICONS": icons, "TOC": toc}
+    pieces = list(compiled)
+    for i in range(1, len(pieces), 2):
+        pieces[i] = values[pieces[i]]
+    return pieces
+
+
+def render_compiled(compiled, page_content, page_nav="", icons="", toc=""):
+    """Render a page from a compiled template with a single join.
+
+    *page_nav* is the page's sidebar nav, for a template compiled with a
+    per-page nav, *icons* the page's icon sprite (see icons.py) and *toc*
+    its table of contents (see build_toc_html()).
+    """
+    return "".join(_page_pieces(compiled, page_content, page_nav, icons, toc))
+
+
+def write_page(f, compiled, page_content, page_nav="", icons="", toc=""):
+    """Write a page from a compiled template straight to the open file *f*."""
+    f.writelines(_page_pieces(compiled, page_content, page_nav, icons, toc))
+
+
+def render_page(template, config, page_content, nav_html, page_filename, headings=()):
+    """Render a page by substituting variables into the template.
+
+    *headings* is the heading list parse_markdown() returns, for the TOC.
+    Compiles the template for this one page; to render many pages, compile
+    it once with compile_template() and use render_compiled()/write_page().
+    """
+    return render_compiled(compile_template(template, config, nav_html), page_content,
+                           toc=build_toc_html(headings))
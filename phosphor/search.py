@@ -1,19 +1,34 @@
 """Search index generator for phosphor-docs.
 
-Walks all pages, extracts headings and content per section,
-generates a SEARCH_INDEX array for the search.js template.
+Takes the headings and content per section of each page as it is built
+(page_entries()), and generates the search index that search.js fetches on
+first use: the entries plus an inverted index over their terms.
 """
 
+import hashlib
 import json
 import re
 
+from .document import Section, heading_text
+
+
+# Tags and named entities, each replaced by a space
+_MARKUP_RE = re.compile(r"<[^>]+>|&[a-z]+;")
+
+# How much page HTML after a heading its keywords are taken from
+_CHUNK_SIZE = 2000
+
+# A search term: a run of ASCII letters/digits or BMP characters from U+00C0
+# up. search.js splits queries with the same character class.
+_TERM_RE = re.compile("[a-z0-9\u00c0-\uffff]+")
+
+# Field bits of a posting; search.js weights them 20 / 10 / 5
+_TITLE, _KEYWORDS, _SECTION = 1, 2, 4
+
 
 def _strip_html(html_text):
     """Strip HTML tags and return plain text."""
-    text = re.sub(r"<[^>]+>", " ", html_text)
-    text = re.sub(r"&[a-z]+;", " ", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    return " ".join(_MARKUP_RE.sub(" ", html_text).split())
 
 
 def _extract_keywords(text, max_words=100):
@@ -22,78 +37,97 @@ def _extract_keywords(text, max_words=100):
     return " ".join(words).lower()
 
 
-def build_search_index(pages_data):
-    """Build search index from parsed pages.
+def build_search_index(pages_entries):
+    """Build the search index from each page's entries (see page_entries()).
 
-    pages_data: list of {
-        "filename": "index.html",
-        "headings": [{"level": 2|3, "text": str, "id": str}],
-        "html": str  (full page HTML content)
+    pages_entries: iterable of per-page entry lists, in page order.
+
+    Returns the index as a JSON string: {
+        "entries": [{"title", "section", "url", "keywords"}, ...],
+        "terms": [sorted list of every term],
+        "postings": [for each term, flat [entry, fields, entry, fields, ...]]
+    }
+    where fields is a bitmask of _TITLE, _KEYWORDS and _SECTION.
+    """
+    entries = []
+    postings = {}
+    for page in pages_entries:
+        for entry in page:
+            i = len(entries)
+            entries.append(entry)
+            fields = {}
+            for bit, text in ((_TITLE, entry["title"]), (_KEYWORDS, entry["keywords"]), (_SECTION, entry["section"])):
+                for term in _TERM_RE.findall(text.lower()):
+                    fields[term] = fields.get(term, 0) | bit
+            for term, mask in fields.items():
+                postings.setdefault(term, []).extend((i, mask))
+
+    terms = sorted(postings)
+    index = {
+        "entries": entries,
+        "terms": terms,
+        "postings": [postings[t] for t in terms],
     }
+    return json.dumps(index, separators=(",", ":"))
 
-    Returns JSON string for the SEARCH_INDEX variable.
+
+def page_entries(filename, html, marks):
+    """Return the index entries for one page, in heading order.
+
+    *html* and *marks* come from document.render(marks). A heading's
+    keywords come from the HTML after it, up to _CHUNK_SIZE characters or
+    the start of the next section, whichever is first, so headings are held
+    back until the next section start is known.
     """
-    index = []
-
-    for page in pages_data:
-        filename = page["filename"]
-        headings = page["headings"]
-        html = page["html"]
-
-        # Split content by section
-        sections = re.split(r'<div class="section" id="([^"]+)"', html)
-
-        # First chunk is pre-section content (hero, etc.)
-        current_section = "Overview"
-
-        for heading in headings:
-            if heading["level"] == 2:
-                current_section = heading["text"]
-
-            # Extract a chunk of text around this heading
-            hid = heading["id"]
-            # Find content after this heading ID
-            pattern = rf'id="{re.escape(hid)}"[^>]*>.*?</(?:h[23]|div)>'
-            match = re.search(pattern, html, re.DOTALL)
-            if match:
-                start = match.end()
-                # Get next ~500 chars of content
-                chunk = html[start:start + 2000]
-                # Stop at next section
-                next_section = re.search(r'<div class="section"', chunk)
-                if next_section:
-                    chunk = chunk[:next_section.start()]
-                plain = _strip_html(chunk)
-                keywords = _extract_keywords(plain)
-            else:
-                keywords = heading["text"].lower()
-
-            section_label = current_section if heading["level"] == 3 else "Navigation"
-            if heading["level"] == 2:
-                section_label = _find_nav_group(heading["id"], headings)
-
-            index.append({
-                "title": heading["text"],
-                "section": section_label,
-                "url": f"{filename}#{hid}",
-                "keywords": keywords,
-            })
-
-    return json.dumps(index, indent=2)
-
-
-def _find_nav_group(section_id, headings):
-    """Find the nav group label for a section (just returns section name)."""
-    for h in headings:
-        if h["id"] == section_id and h["level"] == 2:
-            return h["text"]
-    return "Documentation"
-
-
-def inject_search_index(search_js_template, index_json):
-    """Replace {{SEARCH_INDEX}} placeholder in search.js with actual index.
-
-    Safety: index_json is produced by json.dumps() which outputs valid JSON
-    safe for embedding in a JS variable assignment.
+    entries = []
+    pending = []  # (entry, start offset) of headings in the current section
+
+    # First chunk is pre-section content (hero, etc.)
+    current_section = "Overview"
+
+    for offset, node in marks:
+        if node is None:
+            _flush(pending, html, offset)
+            continue
+
+        title = heading_text(node.html)
+        if node.__class__ is Section:
+            current_section = title
+            section_label = title
+        else:
+            section_label = current_section
+
+        entry = {
+            "title": title,
+            "section": section_label,
+            "url": f"{filename}#{node.id}",
+            "keywords": "",
+        }
+        entries.append(entry)
+        pending.append((entry, offset))
+
+    _flush(pending, html, len(html))
+    return entries
+
+
+def _flush(pending, html, section_start):
+    """Fill in keywords for the pending headings, which end at *section_start*."""
+    for entry, start in pending:
+        chunk = html[start:min(start + _CHUNK_SIZE, section_start)]
+        entry["keywords"] = _extract_keywords(_strip_html(chunk))
+    pending.clear()
+
+
+def index_filename(index_json):
+    """Return the content-hashed file name for a serialized index."""
+    digest = hashlib.sha256(index_json.encode("utf-8")).hexdigest()[:12]
+    return f"search-index.{digest}.json"
+
+
+def index_pointer(filename):
+    """Return the JSON of assets/search-index.json, which names the current index file.
+
+    search.js fetches this small file (revalidating it every time) and then
+    the hashed index file it points to, which can be cached indefinitely.
     """
-    return search_js_template.replace("{{SEARCH_INDEX}}", index_json)
+    return json.dumps({"url": filename}) + "\n"
@@ -0,0 +1,350 @@
+"""Preview HTTP server for phosphor serve.
+
+A threaded HTTP/1.1 server for _site/: connections are handled concurrently
+and kept alive, text responses are compressed (with the best precompressed
+.br, .zst or .gz file next to the original that the client accepts, see
+phosphor build --precompress, otherwise gzipped on the fly and cached),
+every response carries an ETag and Last-Modified that conditional requests
+are answered against with 304, and single byte ranges are supported.
+
+In watch mode (see watch.py) HTML responses get the live-reload script and
+/__phosphor/events serves the reload event stream.
+"""
+
+import email.utils
+import gzip
+import http.server
+import io
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote
+
+from . import __version__
+from .watch import EVENTS_PATH, inject_reload_script
+
+
+# Types worth compressing; everything else (images, fonts) is sent as-is
+_COMPRESSIBLE = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+# Bodies smaller than this don't shrink enough to be worth gzipping
+_MIN_GZIP_SIZE = 512
+
+# Precompressed siblings of a file, best first: (content coding, suffix)
+_PRECOMPRESSED = (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz"))
+
+# On-the-fly gzip results kept in memory, keyed by file, mtime and size
+_GZIP_CACHE_SIZE = 256
+
+# Content-hashed files never change under the same name
+_IMMUTABLE_RE = re.compile(r"\.[0-9a-f]{12}\.[a-z]+$")
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class PreviewServer(http.server.ThreadingHTTPServer):
+    """ThreadingHTTPServer serving *site_dir*; *reload* enables watch mode.
+
+    With *site* (a devserver.OnDemandSite) responses come from it instead of
+    from files in *site_dir*.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, site_dir, reload=None, handler=None, site=None):
+        self.site_dir = site_dir
+        self.reload = reload
+        self.site = site
+        self._gzip_cache = OrderedDict()
+        self._gzip_lock = threading.Lock()
+        super().__init__(address, handler or PreviewHandler)
+
+    def gzip_body(self, key, data):
+        """Return gzipped *data*, reusing the result for the same *key*."""
+        with self._gzip_lock:
+            body = self._gzip_cache.get(key)
+            if body is not None:
+                self._gzip_cache.move_to_end(key)
+                return body
+        body = gzip.compress(data, compresslevel=6, mtime=0)
+        with self._gzip_lock:
+            self._gzip_cache[key] = body
+            while len(self._gzip_cache) > _GZIP_CACHE_SIZE:
+                self._gzip_cache.popitem(last=False)
+        return body
+
+
+class PreviewHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler with keep-alive, gzip, validators and ranges."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = f"phosphor/{__version__}"
+
+    # Close idle keep-alive connections so they don't pin a thread forever
+    timeout = 30
+
+    # Headers and body go out in separate writes; with Nagle's algorithm a
+    # kept-alive connection stalls ~40 ms on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    # Add SVG MIME type
+    extensions_map = {
+        **http.server.SimpleHTTPRequestHandler.extensions_map,
+        ".svg": "image/svg+xml",
+    }
+
+    def __init__(self, request, client_address, server):
+        super().__init__(request, client_address, server, directory=server.site_dir)
+
+    def do_GET(self):
+        if self.server.reload is not None and self.path == EVENTS_PATH:
+            self.server.reload.stream(self)
+            return
+        super().do_GET()
+
+    def log_message(self, fmt, *a):
+        if self.server.reload is None or self.path != EVENTS_PATH:
+            print(f"  {a[0]} {a[1]}")
+
+    def send_head(self):
+        """Send the response headers and return a file object for the body.
+
+        Returns None when there is no body (errors, redirects, 304s).
+        """
+        url_path = self.path.split("?", 1)[0].split("#", 1)[0]
+        if self.server.site is not None:
+            return self._send_generated(url_path)
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not url_path.endswith("/"):
+                self.send_response(301)
+                self.send_header("Location", url_path + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            path = os.path.join(path, "index.html")
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        try:
+            return self._send_file(f, path, url_path)
+        except BaseException:
+            f.close()
+            raise
+
+    def _send_generated(self, url_path):
+        """Send a response produced by the on-demand site."""
+        try:
+            found = self.server.site.get(url_path)
+        except (Exception, SystemExit) as e:
+            # Page errors are reported in the terminal and the browser
+            print(f"  Error: cannot render {url_path}: {e}", file=sys.stderr)
+            self.send_error(500, "Render failed", str(e))
+            return None
+        if found is None:
+            self.send_error(404, "File not found")
+            return None
+        rel, data, validator = found
+        ctype = self.guess_type(rel)
+        if self._live_page(rel, ctype):
+            page = inject_reload_script(data.decode("utf-8"))
+            if page is not None:
+                data = page.encode("utf-8")
+                validator += "-live"
+        return self._send_content(url_path, ctype, validator, None, data)
+
+    def _send_file(self, f, path, url_path):
+        """Send headers for the open file *f*; return the body or None."""
+        st = os.fstat(f.fileno())
+        ctype = self.guess_type(path)
+        validator = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        data = None  # the body, when it isn't streamed from f
+        if self._live_page(url_path, ctype):
+            # Watch mode: the page as built plus the live-reload script
+            page = inject_reload_script(f.read().decode("utf-8"))
+            if page is None:
+                f.seek(0)
+            else:
+                data = page.encode("utf-8")
+                validator += "-live"
+        return self._send_content(url_path, ctype, validator, st, data, f, path)
+
+    def _live_page(self, url_path, ctype):
+        """Whether the live-reload script goes into this response: in watch
+        mode, HTML pages only. Files under assets/ (the shared nav
+        fragment) are never pages."""
+        if self.server.reload is None or ctype != "text/html":
+            return False
+        return not unquote(url_path).lstrip("/").startswith("assets/")
+
+    def _send_content(self, url_path, ctype, validator, st, data, f=None, path=None):
+        """Send the response for a body that is either *data* or the open
+        file *f* (at *path*, with stat result *st*); return the body or None."""
+        size = st.st_size if data is None else len(data)
+
+        coding, sibling = self._content_coding(ctype, size, path if data is None else None, st)
+        if coding is not None:
+            validator += "-" + dict(_PRECOMPRESSED)[coding][1:]
+        headers = {
+            "Content-Type": ctype,
+            "ETag": f'"{validator}"',
+            "Cache-Control": self._cache_control(url_path),
+            "Vary": "Accept-Encoding",
+        }
+        if st is not None:
+            headers["Last-Modified"] = self.date_time_string(st.st_mtime)
+        if self._not_modified(headers["ETag"], st.st_mtime if st is not None else None):
+            _close(f)
+            _close(sibling)
+            self._send(304, headers)
+            return None
+
+        if sibling is not None:
+            _close(f)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(os.fstat(sibling.fileno()).st_size)
+            self._send(200, headers)
+            return sibling
+        if coding is not None:
+            if data is None:
+                body = self.server.gzip_body((path, st.st_mtime_ns, st.st_size), f.read())
+            else:
+                body = self.server.gzip_body((url_path, validator), data)
+            _close(f)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(body))
+            self._send(200, headers)
+            return io.BytesIO(body)
+
+        headers["Accept-Ranges"] = "bytes"
+        byte_range = self._byte_range(size, headers["ETag"])
+        if byte_range == "unsatisfiable":
+            _close(f)
+            headers["Content-Range"] = f"bytes */{size}"
+            headers["Content-Length"] = "0"
+            self._send(416, headers)
+            return None
+        if byte_range is not None:
+            start, end = byte_range
+            if data is None:
+                f.seek(start)
+                data = f.read(end - start + 1)
+            else:
+                data = data[start:end + 1]
+            _close(f)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(len(data))
+            self._send(206, headers)
+            return io.BytesIO(data)
+
+        headers["Content-Length"] = str(size)
+        self._send(200, headers)
+        if data is None:
+            return f
+        _close(f)
+        return io.BytesIO(data)
+
+    def _send(self, code, headers):
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _content_coding(self, ctype, size, path, st):
+        """Choose how to compress the response, if at all: only when the
+        type compresses well and no byte range was asked for.
+
+        Returns (coding, sibling): the best precompressed sibling of the
+        file at *path* (with stat result *st*) that the client accepts and
+        that is no older than the file, opened, or ("gzip", None) to gzip on
+        the fly, or (None, None).
+        """
+        if size < _MIN_GZIP_SIZE or "Range" in self.headers:
+            return None, None
+        if not ctype.startswith(_COMPRESSIBLE):
+            return None, None
+        accepted = self._accepted([coding for coding, _ in _PRECOMPRESSED])
+        if path is not None:
+            for coding, suffix in _PRECOMPRESSED:
+                if coding not in accepted:
+                    continue
+                try:
+                    sibling = open(path + suffix, "rb")
+                except OSError:
+                    continue
+                if os.fstat(sibling.fileno()).st_mtime_ns >= st.st_mtime_ns:
+                    return coding, sibling
+                sibling.close()
+        return ("gzip", None) if "gzip" in accepted else (None, None)
+
+    def _accepted(self, codings):
+        """Return those of *codings* that Accept-Encoding allows."""
+        qvalues = {}
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = coding.partition(";")
+            q = params.strip().replace(" ", "")
+            qvalues[name.strip().lower()] = q not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+        return [coding for coding in codings if qvalues.get(coding, qvalues.get("*", False))]
+
+    def _cache_control(self, url_path):
+        if _IMMUTABLE_RE.search(url_path):
+            return "public, max-age=31536000, immutable"
+        # Everything else may change with the next build: always revalidate
+        return "no-cache"
+
+    def _not_modified(self, etag, mtime):
+        """Evaluate If-None-Match (or, without it, If-Modified-Since)."""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since and mtime is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError):
+                return False
+            return since is not None and int(mtime) <= since.timestamp()
+        return False
+
+    def _byte_range(self, size, etag):
+        """Parse a single-range Range header.
+
+        Returns (start, end) inclusive, None to send the whole body (no or
+        unsupported Range header, or a stale If-Range), or "unsatisfiable".
+        """
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range.strip() != etag:
+            return None
+        m = _RANGE_RE.match(header.strip())
+        if not m or m.group(1) == m.group(2) == "":
+            return None
+        first, last = m.group(1), m.group(2)
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                return "unsatisfiable"
+            return (max(0, size - length), size - 1)
+        start = int(first)
+        end = size - 1 if last == "" else min(int(last), size - 1)
+        if start >= size or end < start:
+            return "unsatisfiable"
+        return (start, end)
+
+
+def _close(f):
+    if f is not None:
+        f.close()
+
+
+def make_server(port, site_dir, reload=None, site=None):
+    """Create the preview server for *site_dir* (or *site*) on *port*, all interfaces."""
+    return PreviewServer(("", port), site_dir, reload, site=site)
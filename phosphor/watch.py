@@ -0,0 +1,299 @@
+"""Watch mode for phosphor serve: rebuild on change and live-reload browsers.
+
+A Watcher snapshots the mtime and size of every watched file and reports
+which paths changed. On Linux it sleeps on inotify and only re-checks the
+snapshot when something in a watched directory was touched; elsewhere (or
+if inotify is unavailable) it polls. LiveReload pushes a "reload" event
+over Server-Sent Events to every open page after each rebuild.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import sys
+import threading
+import time
+
+from . import build as build_mod
+from . import icons as icons_mod
+
+
+# How often the snapshot is re-checked without inotify, and as a safety net
+# with it (inotify misses changes on some network and FUSE file systems)
+POLL_INTERVAL = 0.05
+INOTIFY_FALLBACK_INTERVAL = 1.0
+
+# Large trees that rarely change (the vendored icon set) are re-checked this
+# often when polling, instead of every POLL_INTERVAL
+SLOW_POLL_INTERVAL = 2.0
+
+# Editors often save in several steps (truncate + write, or write a temp
+# file and rename it); wait this long after the first event for the rest
+SETTLE_TIME = 0.01
+
+EVENTS_PATH = "/__phosphor/events"
+
+# Injected before </body> of every HTML page served in watch mode. The event
+# carries the rebuilt pages; null means everything (config, template, theme).
+RELOAD_SCRIPT = (
+    "<script>\n"
+    "(function() {\n"
+    f"  var source = new EventSource('{EVENTS_PATH}');\n"
+    "  source.addEventListener('reload', function(e) {\n"
+    "    var pages = JSON.parse(e.data).pages;\n"
+    "    var path = decodeURIComponent(location.pathname);\n"
+    "    if (path.slice(-1) === '/') path += 'index.html';\n"
+    "    if (!pages || pages.some(function(p) { return path.slice(-p.length - 1) === '/' + p; })) {\n"
+    "      location.reload();\n"
+    "    }\n"
+    "  });\n"
+    "})();\n"
+    "</script>\n"
+)
+
+# Seconds between keep-alive comments on an idle event stream; a write to a
+# closed connection is how a stream notices the browser has gone away
+_HEARTBEAT = 15
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM
+            | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+
+
+def snapshot(paths, skip=()):
+    """Return {file path: (mtime_ns, size)} for *paths*.
+
+    Directories are walked recursively (skipping hidden entries and the
+    directories in *skip*); paths that don't exist are left out, so
+    deleting a file shows up as a change.
+    """
+    snap = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [d for d in dirs if not d.startswith(".") and os.path.join(root, d) not in skip]
+                for fname in files:
+                    if not fname.startswith("."):
+                        _stat_into(snap, os.path.join(root, fname))
+        else:
+            _stat_into(snap, path)
+    return snap
+
+
+def _stat_into(snap, path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return
+    snap[path] = (st.st_mtime_ns, st.st_size)
+
+
+def _changed(old, new):
+    """Return the sorted paths that were added, removed or modified."""
+    return sorted(p for p in old.keys() | new.keys() if old.get(p) != new.get(p))
+
+
+class _Inotify:
+    """Minimal inotify binding: a non-blocking fd and directory watches."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = set()
+
+    def watch(self, directory):
+        if directory not in self._watched and self._add_watch(self.fd, os.fsencode(directory), _IN_MASK) >= 0:
+            self._watched.add(directory)
+
+    def wait(self, timeout):
+        """Block until an event arrives or *timeout* passes; True on event."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        time.sleep(SETTLE_TIME)
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+
+class Watcher:
+    """Report changes to a set of files and directory trees.
+
+    *slow_paths* are directories inside *paths* that are only re-checked
+    every SLOW_POLL_INTERVAL when polling.
+    """
+
+    def __init__(self, paths, slow_paths=()):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.slow_paths = [os.path.abspath(p) for p in slow_paths]
+        self._snapshot = snapshot(self.paths, self.slow_paths)
+        self._slow_snapshot = snapshot(self.slow_paths)
+        self._slow_due = time.monotonic() + SLOW_POLL_INTERVAL
+        self._inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                self._inotify = None
+        self._watch_dirs()
+
+    @property
+    def mode(self):
+        return "inotify" if self._inotify else "polling"
+
+    def _watch_dirs(self):
+        """(Re)register inotify watches, picking up newly created directories."""
+        if self._inotify is None:
+            return
+        for path in self.paths:
+            if os.path.isdir(path):
+                for root, dirs, _ in os.walk(path):
+                    dirs[:] = [d for d in dirs if not d.startswith(".")]
+                    self._inotify.watch(root)
+            else:
+                self._inotify.watch(os.path.dirname(path))
+
+    def wait(self):
+        """Block until something changes; return the sorted changed paths."""
+        while True:
+            if self._inotify is not None:
+                # Checks are rare here: after an event or once a second
+                self._inotify.wait(INOTIFY_FALLBACK_INTERVAL)
+                slow = True
+            else:
+                time.sleep(POLL_INTERVAL)
+                slow = time.monotonic() >= self._slow_due
+            current = snapshot(self.paths, self.slow_paths)
+            changed = _changed(self._snapshot, current)
+            if slow:
+                self._slow_due = time.monotonic() + SLOW_POLL_INTERVAL
+                slow_current = snapshot(self.slow_paths)
+                slow_changed = _changed(self._slow_snapshot, slow_current)
+                if slow_changed:
+                    self._slow_snapshot = slow_current
+                    changed = sorted(changed + slow_changed)
+            if changed:
+                self._snapshot = current
+                self._watch_dirs()
+                return changed
+
+
+class LiveReload:
+    """Fan reload events out to every connected event stream."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._data = ""
+
+    def notify(self, pages=None):
+        """Tell open pages to reload; *pages* limits it to those HTML files."""
+        with self._cond:
+            self._generation += 1
+            self._data = json.dumps({"pages": pages})
+            self._cond.notify_all()
+
+    def stream(self, handler):
+        """Serve an event stream on *handler* until the client disconnects."""
+        handler.close_connection = True
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        with self._cond:
+            seen = self._generation
+        try:
+            handler.wfile.write(b"retry: 500\n\n")
+            handler.wfile.flush()
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._generation != seen, _HEARTBEAT)
+                    fresh = self._generation != seen
+                    seen, data = self._generation, self._data
+                message = f"event: reload\ndata: {data}\n\n" if fresh else ": ping\n\n"
+                handler.wfile.write(message.encode("utf-8"))
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def inject_reload_script(html):
+    """Return page HTML with RELOAD_SCRIPT added before </body>, or None
+    if it has no </body>: an HTML fragment, such as the shared nav, which
+    must be sent as it is."""
+    pos = html.rfind("</body>")
+    if pos == -1:
+        return None
+    return html[:pos] + RELOAD_SCRIPT + html[pos:]
+
+
+def watched_paths(project_dir):
+    """Return the inputs a build reads: pages/, docs.yaml, templates/ and theme/."""
+    phosphor_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return [
+        os.path.join(project_dir, "pages"),
+        os.path.join(project_dir, "docs.yaml"),
+        os.path.join(phosphor_root, "templates"),
+        os.path.join(phosphor_root, "theme"),
+    ]
+
+
+def rebuild_forever(project_dir, reload, cache, rebuild=True, precompress=False):
+    """Rebuild *project_dir* whenever its inputs change and notify *reload*.
+
+    Runs until the process exits. The build is incremental and *cache* keeps
+    parsed pages in memory, so a one-page edit re-parses and re-renders just
+    that page; browsers are told to reload as soon as it is written, before
+    the search index is regenerated. A failed build is reported and the
+    watcher keeps going.
+
+    With rebuild=False (serve --on-demand renders pages per request) nothing
+    is built: the pages whose sources changed are reloaded straight away.
+    *precompress* is passed on to build().
+    """
+    project_dir = os.path.abspath(project_dir)
+    pages_dir = os.path.join(project_dir, "pages") + os.sep
+    watcher = Watcher(watched_paths(project_dir), [icons_mod.icon_dir()])
+    print(f"Watching for changes ({watcher.mode})...\n")
+
+    while True:
+        changed = watcher.wait()
+        start = time.perf_counter()
+        for path in changed:
+            if path.startswith(project_dir + os.sep):
+                path = os.path.relpath(path, project_dir)
+            print(f"  Changed: {path}")
+        pages_only = all(path.startswith(pages_dir) for path in changed)
+
+        def pages_written(built):
+            if built or not pages_only:
+                reload.notify(built if pages_only else None)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"  Reloaded in {elapsed:.0f} ms")
+
+        if not rebuild:
+            pages_written([os.path.relpath(p, pages_dir).replace(os.sep, "/").replace(".md", ".html")
+                           for p in changed] if pages_only else [])
+            continue
+        try:
+            build_mod.build(project_dir, cache=cache, on_pages_written=pages_written, precompress=precompress)
+        except SystemExit:
+            # build() has already printed the error
+            print("  Build failed; waiting for the next change\n", file=sys.stderr)
+        except Exception as e:
+            print(f"  Error: Build failed: {e}\n", file=sys.stderr)
@@ -1,110 +1,164 @@
-// ── Generate IDs for h3 headings (with dedup) ──
-var usedIds = {};
-function uniqueId(base) {
-  if (!usedIds[base]) {
-    usedIds[base] = 1;
-    return base;
-  }
-  usedIds[base]++;
-  return base + '-' + usedIds[base];
-}
-
-document.querySelectorAll('.content h2, .content h3').forEach(function(el) {
-  if (el.id) {
-    // Track server-generated IDs so client-side fallbacks don't collide
-    var base = el.id.replace(/-\d+$/, '');
-    if (!usedIds[base]) usedIds[base] = 1;
-    else usedIds[base]++;
-  }
-});
-document.querySelectorAll('.content h3').forEach(function(h3) {
-  if (!h3.id) {
-    var base = h3.textContent.trim().toLowerCase()
-      .replace(/[^a-z0-9]+/g, '-')
-      .replace(/(^-|-$)/g, '');
-    h3.id = uniqueId(base);
-  }
-});
-
-// ── Build Table of Contents ──
+// ── Table of Contents ──
+// The build renders it from the page's headings; only scroll spy is added here
 var toc = document.querySelector('.toc');
-if (toc) {
-  var headings = document.querySelectorAll('.content h2, .content h3');
-  if (headings.length > 1) {
-    var html = '<div class="toc-label">On this page</div>';
-    headings.forEach(function(h) {
-      var level = h.tagName.toLowerCase();
-      var targetId;
-      if (h.tagName === 'H2') {
-        var section = h.closest('.section[id]');
-        targetId = section ? section.id : h.id;
-      } else {
-        targetId = h.id;
-      }
-      html += '<a href="#' + targetId + '" class="toc-' + level + '">' + h.textContent.trim() + '</a>';
-    });
-    toc.innerHTML = html;
-  }
-}
 
 // ── Scroll spy — highlight active sidebar link + TOC link ──
+// The section and heading offsets are measured together and cached, and
+// measured again only when the content or the window is resized, so
+// scrolling reads no layout. Updates run at most once a frame and only
+// touch the elements whose state changes.
 var sections = document.querySelectorAll('.section[id]');
-var h3Elements = document.querySelectorAll('.content h3[id]');
 var navLinks = document.querySelectorAll('.sidebar-nav a');
 var tocAnchors = toc ? toc.querySelectorAll('a') : [];
+var tocTargets = [];
+for (var t = 0; t < tocAnchors.length; t++) {
+  tocTargets.push(document.getElementById(tocAnchors[t].getAttribute('href').slice(1)));
+}
 var backToTop = document.querySelector('.back-to-top');
 
-function onScroll() {
-  var scrollY = window.scrollY + 120;
-
-  // Back to top visibility
-  if (window.scrollY > 400) {
-    backToTop.classList.add('visible');
-  } else {
-    backToTop.classList.remove('visible');
-  }
-
-  // Sidebar scroll spy
-  var current = '';
-  sections.forEach(function(section) {
-    if (section.offsetTop <= scrollY) {
-      current = section.id;
-    }
-  });
+var sectionTops = null;  // offsetTop of each section, null until measured
+var tocTops = null;      // offsetTop of each TOC anchor's target
+var navLinksById = {};   // section id -> nav links ending in #id
+var activeNav = null;
+var activeToc = -1;
+var backToTopShown = false;
+var spyQueued = false;
 
+function indexNavLinks() {
+  navLinksById = Object.create(null);  // no inherited keys: ids like "constructor"
+  activeNav = null;
   navLinks.forEach(function(link) {
-    link.classList.remove('active');
     var href = link.getAttribute('href');
-    if (href === '#' + current || href.endsWith('#' + current)) {
-      link.classList.add('active');
+    var hash = href.lastIndexOf('#');
+    if (hash !== -1) {
+      var id = href.slice(hash + 1);
+      (navLinksById[id] = navLinksById[id] || []).push(link);
     }
   });
+}
+
+function measureOffsets() {
+  sectionTops = [];
+  for (var i = 0; i < sections.length; i++) sectionTops.push(sections[i].offsetTop);
+  tocTops = [];
+  for (var j = 0; j < tocTargets.length; j++) {
+    tocTops.push(tocTargets[j] ? tocTargets[j].offsetTop : Infinity);
+  }
+}
+
+// Index of the last offset at or above y, or -1
+function lastAbove(tops, y) {
+  var found = -1;
+  for (var i = 0; i < tops.length; i++) {
+    if (tops[i] <= y) found = i;
+  }
+  return found;
+}
+
+function updateScrollSpy() {
+  spyQueued = false;
+  if (sectionTops === null) measureOffsets();
+  var scrollY = window.scrollY;
+
+  // Back to top visibility
+  var shown = scrollY > 400;
+  if (shown !== backToTopShown) {
+    backToTop.classList.toggle('visible', shown);
+    backToTopShown = shown;
+  }
+
+  // Sidebar scroll spy
+  var s = lastAbove(sectionTops, scrollY + 120);
+  var current = s === -1 ? '' : sections[s].id;
+  if (current !== activeNav) {
+    (navLinksById[activeNav] || []).forEach(function(link) { link.classList.remove('active'); });
+    (navLinksById[current] || []).forEach(function(link) { link.classList.add('active'); });
+    activeNav = current;
+  }
 
   // TOC scroll spy
-  if (tocAnchors.length > 0) {
-    var currentToc = '';
-    tocAnchors.forEach(function(a) {
-      var id = a.getAttribute('href').slice(1);
-      var el = document.getElementById(id);
-      if (el && el.offsetTop <= scrollY) {
-        currentToc = id;
-      }
-    });
-    tocAnchors.forEach(function(a) {
-      a.classList.remove('active');
-      if (a.getAttribute('href') === '#' + currentToc) {
-        a.classList.add('active');
-      }
-    });
+  var currentToc = lastAbove(tocTops, scrollY + 120);
+  if (currentToc !== activeToc) {
+    if (activeToc !== -1) tocAnchors[activeToc].classList.remove('active');
+    if (currentToc !== -1) tocAnchors[currentToc].classList.add('active');
+    activeToc = currentToc;
+  }
+}
+
+function onScroll() {
+  if (!spyQueued) {
+    spyQueued = true;
+    requestAnimationFrame(updateScrollSpy);
   }
 }
 
+function remeasure() {
+  sectionTops = null;
+  onScroll();
+}
+
+indexNavLinks();
 window.addEventListener('scroll', onScroll, { passive: true });
+window.addEventListener('resize', remeasure);
+// Web fonts, images and opened accordions move the headings without a
+// window resize, but they all resize the content
+var content = document.querySelector('.content');
+if (window.ResizeObserver && content) {
+  new ResizeObserver(remeasure).observe(content);
+} else {
+  window.addEventListener('load', remeasure);
+}
 onScroll();
 
 // ── Close mobile sidebar on nav click ──
-navLinks.forEach(function(link) {
-  link.addEventListener('click', function() {
-    document.querySelector('.sidebar').classList.remove('open');
+function bindNavLinks() {
+  navLinks.forEach(function(link) {
+    link.addEventListener('click', function() {
+      document.querySelector('.sidebar').classList.remove('open');
+    });
   });
-});
\ No newline at end of file
+}
+bindNavLinks();
+
+// ── Shared nav — swap the page's nav group for the full nav fragment ──
+// With site.shared_nav the full nav is built once into assets/nav.<hash>.html;
+// it is kept in sessionStorage so moving between pages doesn't refetch it.
+var navHolder = document.querySelector('.sidebar-nav [data-nav-src]');
+if (navHolder) {
+  var navSrc = navHolder.getAttribute('data-nav-src');
+  var storedNav = null;
+  try { storedNav = sessionStorage.getItem(navSrc); } catch (e) {}
+  if (storedNav !== null) {
+    showFullNav(storedNav);
+  } else {
+    fetch(navSrc).then(function(res) {
+      if (!res.ok) throw new Error('Failed to load ' + navSrc + ': ' + res.status);
+      return res.text();
+    }).then(function(html) {
+      try { sessionStorage.setItem(navSrc, html); } catch (e) {}
+      showFullNav(html);
+    }).catch(function() {});  // the page's own nav group stays
+  }
+}
+
+function showFullNav(html) {
+  var sidebarNav = navHolder.parentNode;
+  var before = navHolder.getBoundingClientRect().top;
+  navHolder.innerHTML = html;
+  navLinks = document.querySelectorAll('.sidebar-nav a');
+  indexNavLinks();
+  bindNavLinks();
+  onScroll();
+
+  // Keep this page's entry where it was: a long nav would otherwise start
+  // scrolled to the top
+  var page = location.pathname.split('/').pop() || 'index.html';
+  for (var i = 0; i < navLinks.length; i++) {
+    var href = navLinks[i].getAttribute('href');
+    if (href === page || href.lastIndexOf(page + '#', 0) === 0) {
+      var group = navLinks[i].closest('.nav-group');
+      sidebarNav.scrollTop += group.getBoundingClientRect().top - before;
+      break;
+    }
+  }
+}
\ No newline at end of file
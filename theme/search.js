@@ -1,23 +1,96 @@
 // Phosphor Docs — Search Engine
-// Search index is injected at build time
-var SEARCH_INDEX = {{SEARCH_INDEX}};
+// The index is built at build time and fetched the first time the search
+// box is focused: assets/search-index.json names the content-hashed index
+// file, so this script and the index are cached independently.
+var SEARCH_INDEX = null;
+var SEARCH_BASE = document.currentScript ? document.currentScript.src : 'assets/search.js';
+var searchIndexRequest = null;
+
+// Fetch the index once; resolves with SEARCH_INDEX
+function loadSearchIndex() {
+  if (!searchIndexRequest) {
+    searchIndexRequest = fetchJson(new URL('search-index.json', SEARCH_BASE), { cache: 'no-cache' })
+      .then(function(pointer) { return fetchJson(new URL(pointer.url, SEARCH_BASE)); })
+      .then(function(index) {
+        SEARCH_INDEX = index;
+        return index;
+      }, function(err) {
+        searchIndexRequest = null;  // let the next focus retry
+        throw err;
+      });
+  }
+  return searchIndexRequest;
+}
+
+function fetchJson(url, options) {
+  return fetch(url, options).then(function(res) {
+    if (!res.ok) throw new Error('Failed to load ' + url + ': ' + res.status);
+    return res.json();
+  });
+}
+
+// Search terms: same character class as _TERM_RE in phosphor/search.py
+var TERM_RE = /[a-z0-9\u00c0-\uffff]+/g;
+
+// Posting field bits (title, keywords, section) and their per-word scores
+var FIELD_TITLE = 1, FIELD_KEYWORDS = 2, FIELD_SECTION = 4;
+
+// Index of the first term >= prefix in the sorted term list
+function lowerBound(terms, prefix) {
+  var lo = 0, hi = terms.length;
+  while (lo < hi) {
+    var mid = (lo + hi) >>> 1;
+    if (terms[mid] < prefix) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
 
 // Search logic — returns scored + filtered results (max 8)
+//
+// Candidates come from the postings of every term that starts with a query
+// word, so the work per keystroke grows with the number of matches rather
+// than the size of the index.
 function searchDocs(query) {
   if (!query || !query.trim()) return [];
 
+  if (!SEARCH_INDEX) return [];
+
   var q = query.toLowerCase().trim();
-  var words = q.split(/\s+/).filter(function(w) { return w.length >= 2; });
+  var words = (q.match(TERM_RE) || []).filter(function(w) { return w.length >= 2; });
   if (words.length === 0) return [];
 
-  var scored = [];
+  var entries = SEARCH_INDEX.entries;
+  var terms = SEARCH_INDEX.terms;
+  var postings = SEARCH_INDEX.postings;
+
+  // Per-word matching: OR together the fields each word hits in each entry
+  var hits = {};        // entry index -> array of per-word field masks
+  var candidates = [];
+  for (var j = 0; j < words.length; j++) {
+    var w = words[j];
+    for (var t = lowerBound(terms, w); t < terms.length && terms[t].lastIndexOf(w, 0) === 0; t++) {
+      var list = postings[t];
+      for (var p = 0; p < list.length; p += 2) {
+        var id = list[p];
+        var masks = hits[id];
+        if (!masks) {
+          masks = hits[id] = [];
+          candidates.push(id);
+        }
+        masks[j] = (masks[j] || 0) | list[p + 1];
+      }
+    }
+  }
 
-  for (var i = 0; i < SEARCH_INDEX.length; i++) {
-    var entry = SEARCH_INDEX[i];
+  // Score in index order so equal scores keep page order
+  candidates.sort(function(a, b) { return a - b; });
+
+  var scored = [];
+  for (var i = 0; i < candidates.length; i++) {
+    var entry = entries[candidates[i]];
+    var masks = hits[candidates[i]];
     var title = entry.title.toLowerCase();
-    var keywords = entry.keywords.toLowerCase();
-    var section = entry.section.toLowerCase();
-    var all = title + ' ' + keywords + ' ' + section;
     var score = 0;
 
     // Full-query matching against title
@@ -30,42 +103,18 @@ function searchDocs(query) {
     }
 
     // Full-query matching against keywords
-    if (keywords.indexOf(q) !== -1) {
+    if (entry.keywords.indexOf(q) !== -1) {
       score += 30;
     }
 
-    // Per-word matching
     var wordHits = 0;
-    for (var j = 0; j < words.length; j++) {
-      var w = words[j];
-      var hit = false;
-
-      if (title.indexOf(w) !== -1) {
-        score += 20;
-        hit = true;
-      }
-      if (keywords.indexOf(w) !== -1) {
-        score += 10;
-        hit = true;
-      }
-      if (section.indexOf(w) !== -1) {
-        score += 5;
-        hit = true;
-      }
-
-      // Prefix matching
-      if (!hit) {
-        var parts = all.split(/[\s/.\-_]+/);
-        for (var k = 0; k < parts.length; k++) {
-          if (parts[k].indexOf(w) === 0 && w.length >= 3) {
-            score += 6;
-            hit = true;
-            break;
-          }
-        }
-      }
-
-      if (hit) wordHits++;
+    for (var k = 0; k < words.length; k++) {
+      var m = masks[k];
+      if (!m) continue;
+      if (m & FIELD_TITLE) score += 20;
+      if (m & FIELD_KEYWORDS) score += 10;
+      if (m & FIELD_SECTION) score += 5;
+      wordHits++;
     }
 
     // Bonus for matching ALL query words
@@ -73,9 +122,7 @@ function searchDocs(query) {
       score += 25;
     }
 
-    if (score > 0) {
-      scored.push({ entry: entry, score: score });
-    }
+    scored.push({ entry: entry, score: score });
   }
 
   scored.sort(function(a, b) { return b.score - a.score; });
@@ -166,9 +213,22 @@ function escapeHtml(str) {
     activeIndex = -1;
   }
 
+  input.addEventListener('focus', function() {
+    loadSearchIndex().catch(function() {});
+  });
+
   input.addEventListener('input', function() {
-    var results = searchDocs(input.value);
-    render(results, input.value);
+    if (SEARCH_INDEX) {
+      render(searchDocs(input.value), input.value);
+      return;
+    }
+    // Index still loading: search whatever has been typed once it arrives
+    loadSearchIndex().then(function() {
+      render(searchDocs(input.value), input.value);
+    }, function() {
+      resultsBox.innerHTML = '<div class="search-no-results">Search index unavailable</div>';
+      resultsBox.classList.add('visible');
+    });
   });
 
   input.addEventListener('keydown', function(e) {